@@ -14,43 +14,66 @@ class MovingAverage(Module):
     `sample` is the input signal, and is signed.
 
     Outputs `x`, which is the average of the current value of `sample`
-        and its previous three values, delayed by two additional clocks
-        due to pipelining.
+        and its previous three values, registered once.
+
+    The sum is kept as a running total which is updated each clock by
+    adding the new sample and subtracting the one leaving the window.
     """
     def __init__(self, sample):
         self.width = sample.nbits
-        self.sr = [Signal((self.width + 2, True)) for _ in range(4)]
-        self.sum11 = Signal((self.width+2, True))
-        self.sum12 = Signal((self.width+2, True))
-        self.x = Signal((self.width+2, True))
+        self.sr = [Signal((self.width, True)) for _ in range(4)]
+        # The total of four samples fits in two extra bits, and since any
+        # overflow in the running total wraps modulo its width, the total
+        # is always exact.
+        self.acc = Signal((self.width+2, True))
+        self.x = self.acc
         self.sync += [
             self.sr[0].eq(sample),
             self.sr[1].eq(self.sr[0]),
             self.sr[2].eq(self.sr[1]),
             self.sr[3].eq(self.sr[2]),
-            self.sum11.eq(self.sr[0] + self.sr[1]),
-            self.sum12.eq(self.sr[2] + self.sr[3]),
-            self.x.eq(self.sum11 + self.sum12)]
+            self.acc.eq(self.acc + sample - self.sr[3])]
 
 
 def test_moving_average():
     import numpy as np
+    from migen import Memory
     from migen.sim import run_simulation
 
+    n = 100
+    wave = np.random.randint(-2048, 2047, n)
+
+    # Play the samples out of a ROM and record each output into a RAM, so
+    # the testbench only has to wait for the simulation to finish.
     samp = Signal((12, True))
     ma = MovingAverage(samp)
-    wave = np.random.randint(-2048, 2047, 100).astype(np.int)
+    wave_rom = Memory(12, n+8, init=[int(s) & 0xFFF for s in wave])
+    wave_port = wave_rom.get_port()
+    out_ram = Memory(len(ma.x), n+8)
+    out_port = out_ram.get_port(write_capable=True)
+    ctr = Signal(max=n+8)
+    ma.sync += ctr.eq(ctr + 1)
+    ma.comb += [
+        wave_port.adr.eq(ctr),
+        samp.eq(wave_port.dat_r),
+        out_port.adr.eq(ctr),
+        out_port.dat_w.eq(ma.x),
+        out_port.we.eq(1),
+    ]
+    ma.specials += [wave_rom, wave_port, out_ram, out_port]
+
     out = []
 
     def tb():
-        for s in wave:
-            (yield samp.eq(int(s)))
-            out.append((yield ma.x))
+        for _ in range(n+7):
             yield
-        expected = np.cumsum(wave).astype(np.int)
-        expected[4:] = expected[4:] - expected[:-4]
-        expected = expected[3:-3] >> 2
-        expected = expected.tolist()
-        assert out[6:] == expected
+        for i in range(n+2):
+            out.append((yield out_ram[i]))
 
     run_simulation(ma, tb())
+
+    # Each sample reaches `x` two clocks after it is addressed in the ROM.
+    half = 2**(len(ma.x) - 1)
+    out = [(x + half) % (2*half) - half for x in out]
+    expected = np.convolve(wave, np.ones(4, dtype=int))[:n]
+    assert out[2:] == expected.tolist()
@@ -4,16 +4,52 @@ AXI3 interfaces.
 Copyright 2017 Adam Greig
 """
 
+from functools import reduce
+from operator import or_
+
 from migen import Module, Signal, FSM, If, NextState, NextValue, Case, Mux
-from migen import Array
+from migen import Cat, Memory, Replicate
+from migen.genlib.fifo import SyncFIFO
+
 
+class _AXI3Port:
+    """
+    Common base for AXI3 port bundles, recording the signal widths so that
+    modules attached to a port can size their own signals to match.
+
+    Subclasses list the names of their signals in `MASTER_SIGNALS` (driven
+    by the master), `SLAVE_SIGNALS` (driven by the slave, other than
+    handshakes) and `SLAVE_HANDSHAKES` (the slave-driven VALID and READY),
+    so whole ports can be routed without naming every signal.
+    """
+    MASTER_SIGNALS = ()
+    SLAVE_SIGNALS = ()
+    SLAVE_HANDSHAKES = ()
 
-class AXI3ReadPort:
     def __init__(self, id_width, addr_width, data_width):
         self.id_width = id_width
         self.addr_width = addr_width
         self.data_width = data_width
 
+    def master_signals(self):
+        return [getattr(self, name) for name in self.MASTER_SIGNALS]
+
+    def slave_signals(self):
+        return [getattr(self, name) for name in self.SLAVE_SIGNALS]
+
+    def slave_handshakes(self):
+        return [getattr(self, name) for name in self.SLAVE_HANDSHAKES]
+
+
+class AXI3ReadPort(_AXI3Port):
+    MASTER_SIGNALS = ("arid", "araddr", "arlen", "arsize", "arburst",
+                      "arlock", "arcache", "arprot", "arvalid", "rready")
+    SLAVE_SIGNALS = ("rid", "rdata", "rresp", "rlast")
+    SLAVE_HANDSHAKES = ("arready", "rvalid")
+
+    def __init__(self, id_width, addr_width, data_width):
+        super().__init__(id_width, addr_width, data_width)
+
         # Read Address
         self.arid = Signal(id_width)
         self.araddr = Signal(addr_width)
@@ -35,11 +71,15 @@ class AXI3ReadPort:
         self.rready = Signal()
 
 
-class AXI3WritePort:
+class AXI3WritePort(_AXI3Port):
+    MASTER_SIGNALS = ("awid", "awaddr", "awlen", "awsize", "awburst",
+                      "awlock", "awcache", "awprot", "awvalid",
+                      "wid", "wdata", "wstrb", "wlast", "wvalid", "bready")
+    SLAVE_SIGNALS = ("bid", "bresp")
+    SLAVE_HANDSHAKES = ("awready", "wready", "bvalid")
+
     def __init__(self, id_width, addr_width, data_width):
-        self.id_width = id_width
-        self.addr_width = addr_width
-        self.data_width = data_width
+        super().__init__(id_width, addr_width, data_width)
 
         # Write Address
         self.awid = Signal(id_width)
@@ -87,107 +127,232 @@ RESP_SLVERR = 0b10
 RESP_DECERR = 0b11
 
 
+def _regfile_depth(regfile):
+    """
+    Returns the number of registers in `regfile`, an Array or a Memory.
+    """
+    if isinstance(regfile, Memory):
+        return regfile.depth
+    else:
+        return len(regfile)
+
+
+def _regfile_width(regfile):
+    """
+    Returns the width of the widest register in `regfile`, an Array or a
+    Memory.
+    """
+    if isinstance(regfile, Memory):
+        return regfile.width
+    else:
+        return max(len(reg) for reg in regfile)
+
+
+def _beat_size(data_width):
+    """
+    Returns the ARSIZE/AWSIZE encoding for beats of the full `data_width`.
+    """
+    beat_bytes = data_width // 8
+    assert data_width == 8 * beat_bytes
+    assert beat_bytes & (beat_bytes - 1) == 0 and beat_bytes <= 128
+    return beat_bytes.bit_length() - 1
+
+
+def _burst_increments(burst, allowed_bursts):
+    """
+    Returns an expression which is true when a burst of type `burst`
+    increments its address. When only one of FIXED or INCR is allowed,
+    this is a constant rather than a comparison.
+    """
+    if BURST_TYPE_FIXED not in allowed_bursts:
+        return 1
+    elif BURST_TYPE_INCR not in allowed_bursts:
+        return 0
+    else:
+        return burst == BURST_TYPE_INCR
+
+
+def _burst_unsupported(burst, allowed_bursts):
+    """
+    Returns an expression which is true when `burst` is not one of
+    `allowed_bursts`.
+    """
+    return ~reduce(or_, [burst == b for b in allowed_bursts])
+
+
+def _index_out_of_range(idx, n):
+    """
+    Returns an expression which is true when `idx` is not less than `n`.
+    The upper bits of `idx` are just tested for being nonzero, so only the
+    bits needed to count to `n` are compared, and when `n` is a power of
+    two no comparison is needed at all.
+    """
+    bits = (n - 1).bit_length()
+    if len(idx) <= bits:
+        return idx >= n
+    elif n & (n - 1) == 0:
+        return idx[bits:] != 0
+    else:
+        return (idx[bits:] != 0) | (idx[:bits] >= n)
+
+
 class AXI3RegReader(Module):
     """
     AXI3 read-only register file interface.
 
     `read_port` is an AXI3ReadPort. It should be connected to an AXI3 master.
-    `regfile` is an Array which is indexed to respond to reads.
+    `regfile` is an Array which is indexed to respond to reads, or a Memory,
+        in which case a read port is created on it. The Memory itself must
+        still be added to the specials of the module which creates it.
 
     Does not support ARLOCK, ARCACHE, or ARPROT at all.
-    Only supports ARBURST=FIXED or INCR, but not WRAP.
-    Only supports ARSIZE=0b010, i.e., 32bit reads.
+    Only supports ARBURST=FIXED or INCR, but not WRAP. If `allowed_bursts`
+        is just one of these, the other is rejected too, and the burst type
+        need not be checked on every beat.
+    Only supports full width reads, i.e., ARSIZE=0b010 for a 32bit bus.
     Does support burst reads.
-    Responds SLVERR if invalid ARBURST or ARSIZE given, or if the
-        read address is beyond 4*len(regfile).
+    Accepts up to two further read addresses while a burst is being returned.
+    Responds SLVERR if invalid ARBURST or ARSIZE given, or if any read
+        address in the burst is beyond the end of `regfile`.
+
+    If `regfile` contains at least `ROM_THRESHOLD` entries which are all
+    constant integers, it is stored in a ROM instead of a multiplexer.
     """
-    def __init__(self, read_port, regfile):
+    ROM_THRESHOLD = 16
+
+    def __init__(self, read_port, regfile,
+                 allowed_bursts=(BURST_TYPE_FIXED, BURST_TYPE_INCR)):
+        assert set(allowed_bursts) <= {BURST_TYPE_FIXED, BURST_TYPE_INCR}
         port = read_port
+        n_regs = _regfile_depth(regfile)
 
         # Store the control parameters for the active transaction.
         self.readid = Signal(port.id_width)
-        self.readaddr = Signal(port.addr_width)
-        self.burstlen = Signal(4)
-        self.burstsize = Signal(3)
+        self.readidx = Signal(max=n_regs)
+        self.beatsleft = Signal(4)
+        self.lastbeat = Signal()
         self.bursttype = Signal(2)
-        self.beatcount = Signal(4)
         self.response = Signal(2)
 
-        self.submodules.fsm = FSM(reset_state="READY")
-
-        # In READY, we assert ARREADY to indicate we can immediately receive
-        # a new address to read from, and continuously register the input
-        # AR parameters. When ARVALID becomes asserted, we transition to
-        # the PREPARE state.
-        self.fsm.act(
-            "READY",
-            port.arready.eq(1),
-            port.rvalid.eq(0),
-
-            # Capture all input parameters
-            NextValue(self.readid, port.arid),
-            NextValue(self.readaddr, port.araddr),
-            NextValue(self.burstlen, port.arlen),
-            NextValue(self.burstsize, port.arsize),
-            NextValue(self.bursttype, port.arburst),
-
-            # Initialise beatcount to 0
-            NextValue(self.beatcount, 0),
-
-            # Begin processing on ARVALID
-            If(port.arvalid, NextState("PREPARE")),
-        )
-
-        # In PREPARE, we load the required data without yet asserting RVALID,
-        # and also determine the RRESP response and incremenet the read
-        # address and beat count.
-        self.fsm.act(
-            "PREPARE",
-            port.arready.eq(0),
-            port.rvalid.eq(0),
+        # The AR channel is decoupled from the R channel by a small FIFO of
+        # pending transactions, so a new address can be accepted while the
+        # previous burst is still being returned. Each request is validated
+        # as it is accepted, checking the register index of its final beat.
+        # Each register is one full width beat of the data bus.
+        beat_size = _beat_size(port.data_width)
+        lastidx = Signal(max(port.addr_width - beat_size, 4) + 1)
+        error = Signal()
+        self.comb += [
+            If(_burst_increments(port.arburst, allowed_bursts),
+               lastidx.eq(port.araddr[beat_size:] + port.arlen)).Else(
+                   lastidx.eq(port.araddr[beat_size:])),
+            error.eq((port.arsize != beat_size)
+                     | _burst_unsupported(port.arburst, allowed_bursts)
+                     | _index_out_of_range(lastidx, n_regs)),
+        ]
 
-            # Output the current RID and RDATA
-            port.rid.eq(self.readid),
-            port.rdata.eq(regfile[self.readaddr >> 2]),
-
-            # Return an error for burst size not 4 bytes, or WRAP burst type,
-            # or an invalid read address.
-            If((self.burstsize != BURST_SIZE_4)
-               | (self.bursttype == BURST_TYPE_WRAP)
-               | (self.readaddr > 4*len(regfile)),
-               NextValue(self.response, RESP_SLVERR)).Else(
-                   NextValue(self.response, RESP_OKAY)),
-            port.rresp.eq(self.response),
+        ar_id = Signal(port.id_width)
+        ar_idx = Signal(len(self.readidx))
+        ar_len = Signal(4)
+        ar_burst = Signal(2)
+        ar_error = Signal()
+        ar_fields = Cat(ar_id, ar_idx, ar_len, ar_burst, ar_error)
+        ar_incoming = Cat(port.arid,
+                          port.araddr[beat_size:beat_size+len(ar_idx)],
+                          port.arlen, port.arburst, error)
+        self.submodules.addr_fifo = SyncFIFO(len(ar_fields), 2)
+
+        # When the FIFO is empty, an incoming address is presented directly
+        # as the next transaction, so an idle reader starts returning data
+        # on the cycle after the address handshake.
+        ar_valid = Signal()
+        take = Signal()
+        self.comb += [
+            port.arready.eq(self.addr_fifo.writable),
+            self.addr_fifo.din.eq(ar_incoming),
+            If(self.addr_fifo.readable,
+               ar_fields.eq(self.addr_fifo.dout)).Else(
+                   ar_fields.eq(ar_incoming)),
+            ar_valid.eq(self.addr_fifo.readable | port.arvalid),
+            self.addr_fifo.re.eq(take & self.addr_fifo.readable),
+            self.addr_fifo.we.eq(
+                port.arvalid & ~(take & ~self.addr_fifo.readable)),
+        ]
 
-            # Increment the read address if INCR mode is selected.
-            If((self.bursttype == BURST_TYPE_INCR) & (self.beatcount != 0),
-               NextValue(self.readaddr, self.readaddr + 4)),
+        # Loads the next pending transaction as the active one.
+        load = [
+            take.eq(1),
+            NextValue(self.readid, ar_id),
+            NextValue(self.readidx, ar_idx),
+            NextValue(self.beatsleft, ar_len),
+            NextValue(self.lastbeat, ar_len == 0),
+            NextValue(self.bursttype, ar_burst),
+            NextValue(self.response,
+                      Mux(ar_error, RESP_SLVERR, RESP_OKAY)),
+            NextState("WAIT"),
+        ]
 
-            # Increment the beat count
-            NextValue(self.beatcount, self.beatcount + 1),
+        self.submodules.fsm = FSM(reset_state="IDLE")
 
-            # Output whether this is the final beat of the burst
-            port.rlast.eq(self.beatcount == self.burstlen + 1),
-            NextState("WAIT"),
-        )
+        # Register data is always read synchronously, from the register
+        # index for the following cycle, so that the read output is the
+        # data for the current beat without a wide multiplexer on RDATA.
+        nextidx = Signal(len(self.readidx))
+        advance = Signal()
+        self.comb += [
+            advance.eq(self.fsm.ongoing("WAIT") & port.rready
+                       & ~port.rlast
+                       & _burst_increments(self.bursttype, allowed_bursts)),
+            nextidx.eq(Mux(take, ar_idx,
+                           Mux(advance, self.readidx + 1, self.readidx))),
+        ]
 
-        # In WAIT, we assert RVALID, and then wait for RREADY to be asserted
-        # before either returning to PREPARE (if there are more beats in this
-        # burst) or READY (if not).
+        # Memory register files, and large constant register files which we
+        # store in a ROM, are read through a synchronous port. Otherwise we
+        # register the output of the Array.
+        if isinstance(regfile, Memory):
+            mem_port = regfile.get_port()
+            self.specials += mem_port
+            self.comb += mem_port.adr.eq(nextidx)
+            rdata = mem_port.dat_r
+        elif (n_regs >= self.ROM_THRESHOLD
+                and all(isinstance(r, int) for r in regfile)):
+            rom = Memory(port.data_width, n_regs, init=list(regfile))
+            mem_port = rom.get_port()
+            self.specials += rom, mem_port
+            self.comb += mem_port.adr.eq(nextidx)
+            rdata = mem_port.dat_r
+        else:
+            rdata = Signal(port.data_width)
+            self.sync += rdata.eq(regfile[nextidx])
+
+        # In IDLE, we wait for a transaction to arrive and then load it.
+        self.fsm.act("IDLE", If(ar_valid, *load))
+
+        # In WAIT, we assert RVALID with the data for the current beat, and
+        # advance to the next beat whenever RREADY is asserted. RLAST comes
+        # straight from a register, which is set whenever the beat being
+        # moved to is the final one of the burst. After the final beat we
+        # either load the next queued transaction immediately or return to
+        # IDLE.
         self.fsm.act(
             "WAIT",
-            port.arready.eq(0),
             port.rvalid.eq(1),
-
-            # Continue outputting RID, RDATA, RRESP, RLAST set in PREPARE
             port.rid.eq(self.readid),
-            port.rdata.eq(regfile[self.readaddr >> 2]),
+            port.rdata.eq(rdata),
             port.rresp.eq(self.response),
-            port.rlast.eq(self.beatcount == self.burstlen + 1),
+            port.rlast.eq(self.lastbeat),
 
-            # Wait for RREADY before advancing
             If(port.rready,
-                If(port.rlast, NextState("READY")).Else(NextState("PREPARE")))
+               If(port.rlast,
+                  If(ar_valid, *load)
+                  .Else(NextState("IDLE"))
+                  ).Else(
+                  # Increment the register index if INCR mode is selected.
+                  If(_burst_increments(self.bursttype, allowed_bursts),
+                     NextValue(self.readidx, self.readidx + 1)),
+                  NextValue(self.beatsleft, self.beatsleft - 1),
+                  NextValue(self.lastbeat, self.beatsleft == 1)))
         )
 
 
@@ -195,115 +360,217 @@ class AXI3RegWriter(Module):
     """AXI3 write-only register file interface.
 
     `write_port` is an AXI3WritePort. Connect it to an AXI3 master.
-    `regfile` is an Array which is indexed to respond to writes.
+    `regfile` is an Array which is indexed to respond to writes, or a
+        Memory, in which case a write port is created on it. The Memory
+        itself must still be added to the specials of the module which
+        creates it.
 
     Does not support AWLOCK, AWCACHE, or AWPROT at all.
-    Does not honour WSTRB.
-    Only supports AWBURST=FIXED or INCR, not WRAP.
-    Only supports AWSIZE=0b010, i.e., 32 bit writes.
-    Responds SLVERR if invalid AWBURST or AWSIZE given, or if the
-        write address is beyond 4*len(regfile).
+    Only honours WSTRB if `honour_wstrb` is set, in which case only the
+        strobed bytes of each register are written.
+    Only supports AWBURST=FIXED or INCR, not WRAP. If `allowed_bursts` is
+        just one of these, the other is rejected too, and the burst type
+        need not be checked on every beat.
+    Only supports full width writes, i.e., AWSIZE=0b010 for a 32 bit bus.
+    Responds SLVERR if invalid AWBURST or AWSIZE given, or if any
+        write address in the burst is beyond the end of `regfile`, in which
+        case no registers are written.
+    Accepts up to two further write addresses while a burst is being
+        written, and queues up to two write responses.
     """
-    def __init__(self, write_port, regfile):
+    def __init__(self, write_port, regfile,
+                 allowed_bursts=(BURST_TYPE_FIXED, BURST_TYPE_INCR),
+                 honour_wstrb=False):
+        assert set(allowed_bursts) <= {BURST_TYPE_FIXED, BURST_TYPE_INCR}
         port = write_port
+        n_regs = _regfile_depth(regfile)
 
         # Store the control parameters for the active transactions
         self.writeid = Signal(port.id_width)
-        self.writeaddr = Signal(port.addr_width)
-        self.writedata = Signal(port.data_width)
-        self.writestrobe = Signal(port.data_width//8)
-        self.lastwrite = Signal()
-        self.burstlen = Signal(4)
-        self.burstsize = Signal(3)
+        self.writeidx = Signal(max=n_regs)
         self.bursttype = Signal(2)
-        self.beatcount = Signal(4)
         self.response = Signal(2)
 
-        self.submodules.fsm = FSM(reset_state="READY")
+        # Incoming write addresses are queued in a small FIFO, just as
+        # in AXI3RegReader, so AW handshakes do not wait for the previous
+        # burst's data or response.
+        # Each register is one full width beat of the data bus.
+        beat_size = _beat_size(port.data_width)
+        lastidx = Signal(max(port.addr_width - beat_size, 4) + 1)
+        error = Signal()
+        self.comb += [
+            If(_burst_increments(port.awburst, allowed_bursts),
+               lastidx.eq(port.awaddr[beat_size:] + port.awlen)).Else(
+                   lastidx.eq(port.awaddr[beat_size:])),
+            error.eq((port.awsize != beat_size)
+                     | _burst_unsupported(port.awburst, allowed_bursts)
+                     | _index_out_of_range(lastidx, n_regs)),
+        ]
 
-        # In READY, we assert AWREADY to indicate we can immediately receive
-        # a new address to write to, and continuously register the input AW
-        # parameters. When AWVALID becomes asserted, we transition to the
-        # WAIT state.
-        self.fsm.act(
-            "READY",
-            port.awready.eq(1),
-            port.wready.eq(0),
-            port.bvalid.eq(0),
-            port.bid.eq(0),
-            port.bresp.eq(0),
+        aw_id = Signal(port.id_width)
+        aw_idx = Signal(len(self.writeidx))
+        aw_burst = Signal(2)
+        aw_error = Signal()
+        aw_fields = Cat(aw_id, aw_idx, aw_burst, aw_error)
+        aw_incoming = Cat(port.awid,
+                          port.awaddr[beat_size:beat_size+len(aw_idx)],
+                          port.awburst, error)
+        self.submodules.addr_fifo = SyncFIFO(len(aw_fields), 2)
+
+        aw_valid = Signal()
+        take = Signal()
+        self.comb += [
+            port.awready.eq(self.addr_fifo.writable),
+            self.addr_fifo.din.eq(aw_incoming),
+            If(self.addr_fifo.readable,
+               aw_fields.eq(self.addr_fifo.dout)).Else(
+                   aw_fields.eq(aw_incoming)),
+            aw_valid.eq(self.addr_fifo.readable | port.awvalid),
+            self.addr_fifo.re.eq(take & self.addr_fifo.readable),
+            self.addr_fifo.we.eq(
+                port.awvalid & ~(take & ~self.addr_fifo.readable)),
+        ]
 
-            NextValue(self.writeid, port.awid),
-            NextValue(self.writeaddr, port.awaddr),
-            NextValue(self.burstlen, port.awlen),
-            NextValue(self.burstsize, port.awsize),
-            NextValue(self.bursttype, port.awburst),
+        # Loads the next pending transaction as the active one.
+        load = [
+            take.eq(1),
+            NextValue(self.writeid, aw_id),
+            NextValue(self.writeidx, aw_idx),
+            NextValue(self.bursttype, aw_burst),
+            NextValue(self.response,
+                      Mux(aw_error, RESP_SLVERR, RESP_OKAY)),
+            NextState("WAIT"),
+        ]
 
-            NextValue(self.beatcount, 0),
+        # Write responses are queued in a second small FIFO, so the next
+        # burst can be loaded straight after the final beat of the previous
+        # one rather than waiting for its response to be accepted. We only
+        # accept write data while there is room to queue its response.
+        b_fields = Cat(port.bid, port.bresp)
+        self.submodules.resp_fifo = SyncFIFO(len(b_fields), 2)
+        self.comb += [
+            port.bvalid.eq(self.resp_fifo.readable),
+            b_fields.eq(self.resp_fifo.dout),
+            self.resp_fifo.re.eq(port.bready),
+            self.resp_fifo.din.eq(Cat(self.writeid, self.response)),
+        ]
 
-            If(port.awvalid, NextState("WAIT"))
-        )
+        # A Memory register file is written through its own port, which
+        # always addresses the current register. When honouring WSTRB, it
+        # has a write enable per byte, while for an Array we merge the
+        # strobed bytes of WDATA with the current register contents.
+        if isinstance(regfile, Memory):
+            wr_port = regfile.get_port(write_capable=True,
+                                       we_granularity=8 if honour_wstrb else 0)
+            self.specials += wr_port
+            self.comb += [
+                wr_port.adr.eq(self.writeidx),
+                wr_port.dat_w.eq(port.wdata),
+            ]
+            if honour_wstrb:
+                store = wr_port.we.eq(port.wstrb)
+            else:
+                store = wr_port.we.eq(1)
+        elif honour_wstrb:
+            mask = Cat(*[Replicate(port.wstrb[i], 8)
+                         for i in range(len(port.wstrb))])
+            reg = regfile[self.writeidx]
+            store = NextValue(reg, (reg & ~mask) | (port.wdata & mask))
+        else:
+            store = NextValue(regfile[self.writeidx], port.wdata)
 
-        # In WAIT we continuously register the data to write until we see
-        # WVALID, then transition to STORE to process it.
+        self.submodules.fsm = FSM(reset_state="IDLE")
+
+        # In IDLE, we wait for a transaction to arrive and then load it.
+        self.fsm.act("IDLE", If(aw_valid, *load))
+
+        # In WAIT we accept one beat of write data per cycle, saving it to
+        # the register file. On the final beat we queue the response, then
+        # either load the next transaction immediately or return to IDLE.
         self.fsm.act(
             "WAIT",
-            port.awready.eq(0),
-            port.wready.eq(1),
-            port.bvalid.eq(0),
-            port.bid.eq(0),
-            port.bresp.eq(0),
-
-            NextValue(self.writedata, port.wdata),
-            NextValue(self.writestrobe, port.wstrb),
-            NextValue(self.lastwrite, port.wlast),
-
-            If(port.wvalid, NextState("STORE"))
-        ),
-
-        # Save the recently registered incoming data to the register file,
-        # then either transition back to WAIT if there's more data, or
-        # on to RESPOND if not.
-        self.fsm.act(
-            "STORE",
-            port.awready.eq(0),
-            port.wready.eq(1),
-            port.bvalid.eq(0),
-            port.bid.eq(0),
-            port.bresp.eq(0),
-
-            # Save data
-            NextValue(regfile[self.writeaddr >> 2], self.writedata),
-
-            # Response is by default OKAY, but we'll change to SLVERR if
-            # any error conditions occur on any write.
-            If((self.burstsize != BURST_SIZE_4)
-               | (self.bursttype == BURST_TYPE_WRAP)
-               | (self.writeaddr >= 4*len(regfile)),
-               NextValue(self.response, RESP_SLVERR)).Else(
-                   NextValue(self.response, RESP_OKAY)),
-
-            # Increment write address if required
-            If(self.bursttype == BURST_TYPE_INCR,
-               NextValue(self.writeaddr, self.writeaddr + 4)),
-
-            # Increment the beat count
-            NextValue(self.beatcount, self.beatcount + 1),
-
-            If(self.lastwrite, NextState("RESPOND")).Else(NextState("WAIT"))
-        ),
-
-        # Return the response for this write
-        self.fsm.act(
-            "RESPOND",
-            port.awready.eq(0),
-            port.wready.eq(0),
-            port.bvalid.eq(1),
-            port.bresp.eq(self.response),
-            port.bid.eq(self.writeid),
+            port.wready.eq(self.resp_fifo.writable),
+
+            If(port.wvalid & port.wready,
+               # Save data, unless the burst was rejected, since the index
+               # of an out of range write would alias another register.
+               If(self.response == RESP_OKAY, store),
+
+               # Increment the register index if required
+               If(_burst_increments(self.bursttype, allowed_bursts),
+                  NextValue(self.writeidx, self.writeidx + 1)),
+
+               If(port.wlast,
+                  self.resp_fifo.we.eq(1),
+                  If(aw_valid, *load).Else(NextState("IDLE"))))
+        )
+
+
+class AXI3SlaveReader(Module):
+    """AXI3 read-only register file interface on individual signals.
+
+    Takes the master-driven AR and R signals directly, for use where they
+    come straight from a hard bus instance, and wraps an AXI3RegReader.
+    The slave-driven signals are available as `self.arready`, `self.rid`,
+    `self.rdata`, `self.rresp`, `self.rlast`, and `self.rvalid`.
+    """
+    def __init__(self, arid, araddr, arlen, arsize, arburst, arvalid,
+                 rready, regfile):
+        port = AXI3ReadPort(len(arid), len(araddr), _regfile_width(regfile))
+        self.comb += [
+            port.arid.eq(arid),
+            port.araddr.eq(araddr),
+            port.arlen.eq(arlen),
+            port.arsize.eq(arsize),
+            port.arburst.eq(arburst),
+            port.arvalid.eq(arvalid),
+            port.rready.eq(rready),
+        ]
+        self.submodules.reader = AXI3RegReader(port, regfile)
+
+        self.arready = port.arready
+        self.rid = port.rid
+        self.rdata = port.rdata
+        self.rresp = port.rresp
+        self.rlast = port.rlast
+        self.rvalid = port.rvalid
+
+
+class AXI3SlaveWriter(Module):
+    """AXI3 write-only register file interface on individual signals.
 
-            If(port.bready, NextState("READY"))
-        ),
+    Takes the master-driven AW, W and B signals directly, for use where
+    they come straight from a hard bus instance, and wraps an
+    AXI3RegWriter. The slave-driven signals are available as
+    `self.awready`, `self.wready`, `self.bvalid`, `self.bid`, and
+    `self.bresp`.
+
+    `wstrb` is accepted for compatibility but ignored, since the wrapped
+    AXI3RegWriter is not asked to honour WSTRB.
+    """
+    def __init__(self, awid, awaddr, awlen, awsize, awburst, awvalid,
+                 wid, wdata, wstrb, wlast, wvalid, bready, regfile):
+        port = AXI3WritePort(len(awid), len(awaddr), len(wdata))
+        self.comb += [
+            port.awid.eq(awid),
+            port.awaddr.eq(awaddr),
+            port.awlen.eq(awlen),
+            port.awsize.eq(awsize),
+            port.awburst.eq(awburst),
+            port.awvalid.eq(awvalid),
+            port.wid.eq(wid),
+            port.wdata.eq(wdata),
+            port.wlast.eq(wlast),
+            port.wvalid.eq(wvalid),
+            port.bready.eq(bready),
+        ]
+        self.submodules.writer = AXI3RegWriter(port, regfile)
+
+        self.awready = port.awready
+        self.wready = port.wready
+        self.bvalid = port.bvalid
+        self.bid = port.bid
+        self.bresp = port.bresp
 
 
 class AXI3ToFromBRAM(Module):
@@ -312,153 +579,207 @@ class AXI3ToFromBRAM(Module):
     """
     def __init__(self, axi3_read, axi3_write, bram_port,
                  trigger_read, trigger_write, start_addr, length,
-                 axi3_burst_length=1):
+                 axi3_burst_length=1, outstanding=2, bram_base=0):
         """
         `axi3_read`: an AXI3ReadPort or None
         `axi3_write`: an AXI3WritePort or None
-        `bram_port`: a MemoryPort, write capable if axi3_read is not None
-        `trigger_read`: when asserted, copies `length` 32bit words from the
+        `bram_port`: a MemoryPort as wide as the AXI3 data bus, write capable
+                     if axi3_read is not None
+        `trigger_read`: when asserted, copies `length` words from the
                         `axi3_read` into `bram_port` starting at address
                         `start_addr`.
-        `trigger_write`: when asserted, copies `length` 32bit words from the
+        `trigger_write`: when asserted, copies `length` words from the
                          `bram_port` into the `axi3_write` port, starting at
                          address `start_addr`.
+        `length`: a constant number of words, which must be a multiple of
+                  `axi3_burst_length`
+        `axi3_burst_length`: beats per burst, at most 16 for AXI3. Longer
+                             transfers are split into consecutive bursts.
+        `outstanding`: the number of burst addresses which may be issued
+                       ahead of their data, at least 1.
+        `bram_base`: the BRAM address of the first word, a constant or a
+                     signal which must be held during each transfer.
         `self.ready`: asserted when idle
         """
+        assert 1 <= axi3_burst_length <= 16
+        assert outstanding >= 1
+        assert length % axi3_burst_length == 0
         self.ready = Signal()
 
-        self.rlast = Signal()
+        # Every beat is a whole word of the data bus, which is also the
+        # width of the BRAM.
+        data_width = (axi3_read or axi3_write).data_width
+        assert len(bram_port.dat_r) == data_width
+        beat_size = _beat_size(data_width)
+        burst_bytes = (data_width // 8) * axi3_burst_length
+
+        # Since `length` is fixed, the BRAM address counter only needs to
+        # be wide enough to count to it, and the transfer is always exactly
+        # `n_bursts` bursts long.
+        n_bursts = length // axi3_burst_length
         burstcount = Signal(max=axi3_burst_length+1)
+        bram_addr = Signal(max=length)
 
         # These parameters of the read request are fixed
         if axi3_read is not None:
             self.comb += axi3_read.arid.eq(0)
             self.comb += axi3_read.arlen.eq(axi3_burst_length - 1)
-            self.comb += axi3_read.arsize.eq(BURST_SIZE_4)
+            self.comb += axi3_read.arsize.eq(beat_size)
             self.comb += axi3_read.arburst.eq(BURST_TYPE_INCR)
             self.comb += axi3_read.arlock.eq(0b00)
             self.comb += axi3_read.arcache.eq(0b0000)
             self.comb += axi3_read.arprot.eq(0b000)
 
+            # Read data is buffered in a small FIFO which is emptied into
+            # the BRAM every cycle, so RREADY can remain asserted for whole
+            # bursts. We track the number of read addresses still to issue,
+            # and the number issued whose data has not all been received
+            # (at most `outstanding`, so later bursts are requested while
+            # the current one is being returned).
+            ar_left = Signal(max=n_bursts+1)
+            ar_ahead = Signal(max=outstanding+1)
+            ar_fire = Signal()
+            r_done = Signal()
+            self.submodules.rdata_fifo = SyncFIFO(len(axi3_read.rdata), 2)
+
         # These parameters of the write requests are fixed
         if axi3_write is not None:
             self.comb += axi3_write.awid.eq(0)
             self.comb += axi3_write.awlen.eq(axi3_burst_length - 1)
-            self.comb += axi3_write.awsize.eq(BURST_SIZE_4)
+            self.comb += axi3_write.awsize.eq(beat_size)
             self.comb += axi3_write.awburst.eq(BURST_TYPE_INCR)
             self.comb += axi3_write.awlock.eq(0b00)
             self.comb += axi3_write.awcache.eq(0b0000)
             self.comb += axi3_write.awprot.eq(0b000)
             self.comb += axi3_write.wid.eq(0)
             self.comb += axi3_write.wdata.eq(bram_port.dat_r)
-            self.comb += axi3_write.wstrb.eq(0b1111)
+            self.comb += axi3_write.wstrb.eq(2**len(axi3_write.wstrb) - 1)
             self.comb += axi3_write.wlast.eq(burstcount == axi3_burst_length-1)
             self.comb += axi3_write.bready.eq(1)
 
+            # Writes are split into bursts, whose addresses may be issued
+            # ahead of their data. We track the number of addresses still
+            # to issue, the number issued but whose data has not all been
+            # sent (at most `outstanding`), and the number of responses
+            # still due.
+            aw_left = Signal(max=n_bursts+1)
+            aw_ahead = Signal(max=outstanding+1)
+            b_left = Signal(max=n_bursts+1)
+            aw_fire = Signal()
+            w_fire = Signal()
+            w_done = Signal()
+
         # Make the state machine that manages reads and writes.
         # Our `self.ready` output is just whether we're in the READY state.
         self.submodules.fsm = FSM(reset_state="READY")
         self.comb += self.ready.eq(self.fsm.ongoing("READY"))
 
+        if axi3_read is not None:
+            reading = self.fsm.ongoing("READ")
+            self.comb += [
+                axi3_read.arvalid.eq(
+                    reading & (ar_left != 0) & (ar_ahead != outstanding)),
+                axi3_read.rready.eq(reading & self.rdata_fifo.writable),
+                ar_fire.eq(axi3_read.arvalid & axi3_read.arready),
+                self.rdata_fifo.din.eq(axi3_read.rdata),
+                self.rdata_fifo.we.eq(axi3_read.rvalid & axi3_read.rready),
+                r_done.eq(self.rdata_fifo.we & axi3_read.rlast),
+                self.rdata_fifo.re.eq(reading & self.rdata_fifo.readable),
+                bram_port.we.eq(self.rdata_fifo.re),
+                bram_port.dat_w.eq(self.rdata_fifo.dout),
+            ]
+
+        if axi3_write is not None:
+            writing = self.fsm.ongoing("WRITE")
+            self.comb += [
+                axi3_write.awvalid.eq(
+                    writing & (aw_left != 0) & (aw_ahead != outstanding)),
+                axi3_write.wvalid.eq(writing & (aw_ahead != 0)),
+                aw_fire.eq(axi3_write.awvalid & axi3_write.awready),
+                w_fire.eq(axi3_write.wvalid & axi3_write.wready),
+                w_done.eq(w_fire & axi3_write.wlast),
+            ]
+
+        # The BRAM address normally follows `bram_addr`, but while writing
+        # we present the next address as soon as a beat is accepted, so that
+        # the BRAM output is ready for the following beat on the next cycle.
+        if axi3_write is not None:
+            self.comb += bram_port.adr.eq(
+                bram_base + Mux(w_fire, bram_addr + 1, bram_addr))
+        else:
+            self.comb += bram_port.adr.eq(bram_base + bram_addr)
+
         # Form the READY state commands differently depending on whether
         # `axi3_read` and/or `axi3_write` are None
         ready_commands = [
-            NextValue(bram_port.adr, 0),
+            NextValue(bram_addr, 0),
         ]
 
         if axi3_read is not None:
             ready_commands += [
-                axi3_read.arvalid.eq(0),
-                axi3_read.rready.eq(0),
                 NextValue(axi3_read.araddr, start_addr),
-                If(trigger_read, NextState("READ_REQUEST")),
+                NextValue(ar_left, n_bursts),
+                NextValue(ar_ahead, 0),
+                If(trigger_read, NextState("READ")),
             ]
-            self.comb += bram_port.we.eq(self.fsm.ongoing("READ_STORE"))
 
         if axi3_write is not None:
             ready_commands += [
-                axi3_write.awvalid.eq(0),
-                axi3_write.wvalid.eq(0),
                 NextValue(axi3_write.awaddr, start_addr),
-                If(trigger_write, NextState("WRITE_REQUEST"))
+                NextValue(aw_left, n_bursts),
+                NextValue(aw_ahead, 0),
+                NextValue(b_left, n_bursts),
+                NextValue(burstcount, 0),
+                If(trigger_write, NextState("WRITE"))
             ]
 
         self.fsm.act("READY", ready_commands)
 
         # Add relevant states for when axi3_read is not None
         if axi3_read is not None:
+            # While reading, the AR and R channels proceed independently,
+            # and every word leaving the read FIFO is written to the next
+            # BRAM address. We return to READY once the final word has been
+            # written.
             self.fsm.act(
-                "READ_REQUEST",
-                axi3_read.arvalid.eq(1),
-                axi3_read.rready.eq(0),
-
-                If(axi3_read.arready, NextState("READ_WAIT"))
-            )
+                "READ",
+                If(ar_fire,
+                   NextValue(axi3_read.araddr,
+                             axi3_read.araddr + burst_bytes),
+                   NextValue(ar_left, ar_left - 1)),
 
-            self.fsm.act(
-                "READ_WAIT",
-                axi3_read.arvalid.eq(0),
-                axi3_read.rready.eq(1),
+                NextValue(ar_ahead, ar_ahead + ar_fire - r_done),
 
-                NextValue(bram_port.dat_w, axi3_read.rdata),
-                NextValue(self.rlast, axi3_read.rlast),
-                If(axi3_read.rvalid, NextState("READ_STORE"))
-            )
-
-            self.fsm.act(
-                "READ_STORE",
-                axi3_read.arvalid.eq(0),
-                axi3_read.rready.eq(0),
-
-                # Increment BRAM and AXI3 addresses
-                NextValue(bram_port.adr, bram_port.adr + 1),
-                NextValue(axi3_read.araddr, axi3_read.araddr + 4),
-
-                (If(self.rlast == 0, NextState("READ_WAIT"))
-                 .Elif(bram_port.adr == length - 1, NextState("READY"))
-                 .Else(NextState("READ_REQUEST")))
+                If(self.rdata_fifo.re,
+                   NextValue(bram_addr, bram_addr + 1),
+                   If(bram_addr == length - 1, NextState("READY")))
             )
 
         # Add relevant states for when axi3_write is not None
         if axi3_write is not None:
+            # While writing, the AW, W and B channels proceed independently.
+            # The BRAM output for the current address is presented on WDATA
+            # and each accepted beat advances to the next address, so we
+            # write one beat per cycle. We return to READY once the final
+            # write response has been received.
             self.fsm.act(
-                "WRITE_REQUEST",
-                axi3_write.awvalid.eq(1),
-                axi3_write.wvalid.eq(0),
-
-                NextValue(burstcount, 0),
-
-                If(axi3_write.awready, NextState("WRITE_LOAD"))
-            )
-
-            self.fsm.act(
-                "WRITE_LOAD",
-                axi3_write.awvalid.eq(0),
-                axi3_write.wvalid.eq(0),
-
-                NextState("WRITE_WAIT")
-            )
-
-            self.fsm.act(
-                "WRITE_WAIT",
-                axi3_write.awvalid.eq(0),
-                axi3_write.wvalid.eq(1),
-
-                If(axi3_write.wready, NextState("WRITE_NEXT"))
-            )
-
-            self.fsm.act(
-                "WRITE_NEXT",
-                axi3_write.awvalid.eq(0),
-                axi3_write.wvalid.eq(0),
-
-                NextValue(bram_port.adr, bram_port.adr + 1),
-                NextValue(burstcount, burstcount + 1),
-                NextValue(axi3_write.awaddr, axi3_write.awaddr + 4),
-
-                (If(axi3_write.wlast == 0, NextState("WRITE_LOAD"))
-                 .Elif(bram_port.adr == length - 1, NextState("READY"))
-                 .Else(NextState("WRITE_REQUEST")))
+                "WRITE",
+                If(aw_fire,
+                   NextValue(axi3_write.awaddr,
+                             axi3_write.awaddr + burst_bytes),
+                   NextValue(aw_left, aw_left - 1)),
+
+                NextValue(aw_ahead, aw_ahead + aw_fire - w_done),
+
+                If(w_fire,
+                   NextValue(bram_addr, bram_addr + 1),
+                   If(axi3_write.wlast,
+                      NextValue(burstcount, 0)).Else(
+                          NextValue(burstcount, burstcount + 1))),
+
+                If(axi3_write.bvalid,
+                   NextValue(b_left, b_left - 1),
+                   If(b_left == 1, NextState("READY")))
             )
 
 
@@ -467,19 +788,22 @@ class AXI3ToBRAM(AXI3ToFromBRAM):
     Read data from an AXI3 slave into a BRAM.
     """
     def __init__(self, read_port, bram_port, trigger, start_addr, length,
-                 axi3_burst_length=1):
+                 axi3_burst_length=1, outstanding=2, bram_base=0):
         """
-        When `trigger` is asserted, begins copying `length` 32bit words from
-        the AXI3 port `read_port`, starting with address `start_addr`,
-        writing into the BRAM port `bram_port` (a migen MemoryPort with width
-        32 and which is write-capable). The signal `self.ready` is asserted
-        while idle and deasserted during processing. The trigger input is
-        ignored while not ready.
+        When `trigger` is asserted, begins copying `length` words from the
+        AXI3 port `read_port`, starting with address `start_addr`, writing
+        into the BRAM port `bram_port` (a migen MemoryPort as wide as the
+        AXI3 data bus and which is write-capable). The signal `self.ready`
+        is asserted while idle and deasserted during processing. The trigger
+        input is ignored while not ready. Up to `outstanding` burst reads
+        are requested ahead of their data, and words are written from BRAM
+        address `bram_base` onwards.
         """
         super().__init__(axi3_read=read_port, axi3_write=None,
                          bram_port=bram_port, trigger_read=trigger,
                          trigger_write=None, start_addr=start_addr,
-                         length=length, axi3_burst_length=axi3_burst_length)
+                         length=length, axi3_burst_length=axi3_burst_length,
+                         outstanding=outstanding, bram_base=bram_base)
 
 
 class BRAMToAXI3(AXI3ToFromBRAM):
@@ -487,33 +811,263 @@ class BRAMToAXI3(AXI3ToFromBRAM):
     Write data from a BRAM into an AXI3 slave.
     """
     def __init__(self, write_port, bram_port, trigger, start_addr, length,
-                 axi3_burst_length=1):
+                 axi3_burst_length=1, outstanding=2, bram_base=0):
         """
-        When `trigger` is asserted, begins copying `length` 32bit words from
-        the BRAM port `bram_port` (a migen MemoryPort with width 32) into the
-        AXI3 port `write_port`, starting at AXI3 address `start_addr`.  The
-        signal `self.ready` is asserted while idle and deasserted during
-        processing. The trigger input is ignored while not ready.
+        When `trigger` is asserted, begins copying `length` words from the
+        BRAM port `bram_port` (a migen MemoryPort as wide as the AXI3 data
+        bus) into the AXI3 port `write_port`, starting at AXI3 address
+        `start_addr`. The signal `self.ready` is asserted while idle and
+        deasserted during processing. The trigger input is ignored while not
+        ready. Words are read from BRAM address `bram_base` onwards.
         """
         super().__init__(axi3_read=None, axi3_write=write_port,
                          bram_port=bram_port, trigger_read=None,
                          trigger_write=trigger, start_addr=start_addr,
-                         length=length, axi3_burst_length=axi3_burst_length)
+                         length=length, axi3_burst_length=axi3_burst_length,
+                         outstanding=outstanding, bram_base=bram_base)
+
+
+class AXI3Copy(Module):
+    """
+    Copy data from one AXI3 slave to another through a FIFO.
+    """
+    def __init__(self, read_port, write_port, trigger, src_addr, dst_addr,
+                 length, burst=8):
+        """
+        When `trigger` is asserted, begins copying `length` words from the
+        AXI3 port `read_port`, starting at address `src_addr`, into the
+        AXI3 port `write_port`, starting at address `dst_addr`. `length`
+        must be a multiple of the burst length `burst`, which is at most 16.
+        Reads and writes proceed concurrently, with read data passed
+        directly to the write channel through a FIFO. The signal
+        `self.ready` is asserted while idle and deasserted during
+        processing. The trigger input is ignored while not ready.
+        """
+        assert 1 <= burst <= 16
+        assert length % burst == 0
+        assert read_port.data_width == write_port.data_width
+        self.ready = Signal()
+        beat_size = _beat_size(read_port.data_width)
+        burst_bytes = (read_port.data_width // 8) * burst
+
+        # These parameters of the read and write requests are fixed
+        self.comb += [
+            read_port.arid.eq(0),
+            read_port.arlen.eq(burst - 1),
+            read_port.arsize.eq(beat_size),
+            read_port.arburst.eq(BURST_TYPE_INCR),
+            read_port.arlock.eq(0b00),
+            read_port.arcache.eq(0b0000),
+            read_port.arprot.eq(0b000),
+            write_port.awid.eq(0),
+            write_port.awlen.eq(burst - 1),
+            write_port.awsize.eq(beat_size),
+            write_port.awburst.eq(BURST_TYPE_INCR),
+            write_port.awlock.eq(0b00),
+            write_port.awcache.eq(0b0000),
+            write_port.awprot.eq(0b000),
+            write_port.wid.eq(0),
+            write_port.wstrb.eq(2**len(write_port.wstrb) - 1),
+            write_port.bready.eq(1),
+        ]
+
+        # Read data is pushed into the FIFO as it arrives, and written out
+        # again as soon as the write slave accepts it.
+        self.submodules.fifo = SyncFIFO(len(read_port.rdata), 2*burst)
+
+        # As in AXI3ToFromBRAM, we track the number of addresses still to
+        # issue on each side, the number issued but whose data has not all
+        # been transferred (at most two), and the write responses still due.
+        n_bursts = length // burst
+        ar_left = Signal(max=n_bursts+1)
+        ar_ahead = Signal(max=3)
+        aw_left = Signal(max=n_bursts+1)
+        aw_ahead = Signal(max=3)
+        b_left = Signal(max=n_bursts+1)
+        burstcount = Signal(max=burst)
+        ar_fire = Signal()
+        r_done = Signal()
+        aw_fire = Signal()
+        w_fire = Signal()
+        w_done = Signal()
+
+        self.submodules.fsm = FSM(reset_state="READY")
+        self.comb += self.ready.eq(self.fsm.ongoing("READY"))
+
+        copying = self.fsm.ongoing("COPY")
+        self.comb += [
+            read_port.arvalid.eq(
+                copying & (ar_left != 0) & (ar_ahead != 2)),
+            read_port.rready.eq(copying & self.fifo.writable),
+            ar_fire.eq(read_port.arvalid & read_port.arready),
+            self.fifo.din.eq(read_port.rdata),
+            self.fifo.we.eq(read_port.rvalid & read_port.rready),
+            r_done.eq(self.fifo.we & read_port.rlast),
+
+            write_port.awvalid.eq(
+                copying & (aw_left != 0) & (aw_ahead != 2)),
+            write_port.wvalid.eq(
+                copying & (aw_ahead != 0) & self.fifo.readable),
+            write_port.wdata.eq(self.fifo.dout),
+            write_port.wlast.eq(burstcount == burst - 1),
+            aw_fire.eq(write_port.awvalid & write_port.awready),
+            w_fire.eq(write_port.wvalid & write_port.wready),
+            w_done.eq(w_fire & write_port.wlast),
+            self.fifo.re.eq(w_fire),
+        ]
+
+        self.fsm.act(
+            "READY",
+            NextValue(read_port.araddr, src_addr),
+            NextValue(write_port.awaddr, dst_addr),
+            NextValue(ar_left, n_bursts),
+            NextValue(ar_ahead, 0),
+            NextValue(aw_left, n_bursts),
+            NextValue(aw_ahead, 0),
+            NextValue(b_left, n_bursts),
+            NextValue(burstcount, 0),
+            If(trigger, NextState("COPY"))
+        )
+
+        # While copying, all five channels proceed independently. We return
+        # to READY once the final write response has been received.
+        self.fsm.act(
+            "COPY",
+            If(ar_fire,
+               NextValue(read_port.araddr, read_port.araddr + burst_bytes),
+               NextValue(ar_left, ar_left - 1)),
+            NextValue(ar_ahead, ar_ahead + ar_fire - r_done),
+
+            If(aw_fire,
+               NextValue(write_port.awaddr, write_port.awaddr + burst_bytes),
+               NextValue(aw_left, aw_left - 1)),
+            NextValue(aw_ahead, aw_ahead + aw_fire - w_done),
+
+            If(w_fire,
+               If(write_port.wlast,
+                  NextValue(burstcount, 0)).Else(
+                      NextValue(burstcount, burstcount + 1))),
+
+            If(write_port.bvalid,
+               NextValue(b_left, b_left - 1),
+               If(b_left == 1, NextState("READY")))
+        )
+
+
+class _RegisterSlice(Module):
+    """
+    Full-throughput register slice for one valid/ready channel.
+
+    The `src_` signals are the channel on its master side and the `dst_`
+    signals on its slave side; the payloads are typically a Cat of the
+    channel's signals. The destination is driven entirely from registers,
+    and a skid register holds one more beat while the destination stalls,
+    so `src_ready` also comes from a register. A beat can still pass
+    every cycle.
+    """
+    def __init__(self, src_payload, src_valid, src_ready,
+                 dst_payload, dst_valid, dst_ready):
+        skid = Signal(len(src_payload))
+        skid_valid = Signal()
+        self.comb += src_ready.eq(~skid_valid)
+        self.sync += [
+            If(dst_ready | ~dst_valid,
+               If(skid_valid,
+                  dst_payload.eq(skid),
+                  dst_valid.eq(1),
+                  skid_valid.eq(0)
+                  ).Else(
+                  dst_payload.eq(src_payload),
+                  dst_valid.eq(src_valid))
+               ).Elif(src_valid & src_ready,
+                      skid.eq(src_payload),
+                      skid_valid.eq(1))
+        ]
+
+
+def _one_hot_select(sel, options):
+    """
+    Returns the one of `options` selected by the one-hot `sel`, or zero if
+    none is selected. Each option is gated by its select bit and the
+    results are combined in a balanced OR tree, so the depth grows with
+    the logarithm of the number of options rather than linearly.
+    """
+    terms = [Mux(sel[i], option, 0) for i, option in enumerate(options)]
+    while len(terms) > 1:
+        terms = [terms[i] | terms[i + 1] if i + 1 < len(terms) else terms[i]
+                 for i in range(0, len(terms), 2)]
+    return terms[0]
+
+
+def _round_robin(sel, requests, selected_request):
+    """
+    Returns the IDLE state logic for a multiplexer with the one-hot select
+    register `sel` over masters whose address VALIDs are `requests`, and
+    moves to BUSY once a master is selected.
+
+    If the selected master is already requesting (`selected_request`), it
+    stays selected, since the slave may already have accepted its address.
+    Otherwise we select the first requesting master after it, wrapping
+    around, so that the master most recently served has the lowest priority
+    and no master can starve the others.
+    """
+    n = len(requests)
+
+    def grant(order):
+        check = If(selected_request, NextState("BUSY"))
+        for i in order:
+            check = check.Elif(
+                requests[i],
+                NextValue(sel, 1 << i),
+                NextState("BUSY"))
+        return check
+
+    cases = {1 << j: grant([(j + k) % n for k in range(1, n)])
+             for j in range(n)}
+    cases["default"] = grant(range(n))
+    return Case(sel, cases)
 
 
 class AXI3ReadMux(Module):
     """
     AXI3 multi-master single-slave read multiplexer.
     """
-    def __init__(self, slave_port):
+    def __init__(self, slave_port, register_slave=False):
         """
         `slave_port` is an AXI3ReadPort connected to a slave device.
         This module will drive its master-driven signals from one
         of the attached masters.
+        If `register_slave` is set, the AR channel to the slave is
+        registered, adding a cycle of latency to each read but taking the
+        multiplexer out of the path to the slave.
         """
-        self.slave_port = slave_port
         self.master_ports = []
 
+        if not register_slave:
+            self.slave_port = slave_port
+            return
+
+        # Multiplex onto our own port, and register its AR channel onto
+        # the slave port, passing the R channel straight through.
+        port = AXI3ReadPort(slave_port.id_width, slave_port.addr_width,
+                            slave_port.data_width)
+        self.slave_port = port
+        self.submodules.ar_slice = _RegisterSlice(
+            Cat(port.arid, port.araddr, port.arlen, port.arsize,
+                port.arburst, port.arlock, port.arcache, port.arprot),
+            port.arvalid, port.arready,
+            Cat(slave_port.arid, slave_port.araddr, slave_port.arlen,
+                slave_port.arsize, slave_port.arburst, slave_port.arlock,
+                slave_port.arcache, slave_port.arprot),
+            slave_port.arvalid, slave_port.arready)
+        self.comb += [
+            m.eq(s) for m, s in zip(port.slave_signals(),
+                                    slave_port.slave_signals())]
+        self.comb += [
+            port.rvalid.eq(slave_port.rvalid),
+            slave_port.rready.eq(port.rready),
+        ]
+
     def add_master(self):
         """
         Creates a new AXI3ReadPort and returns it. The slave lines on the
@@ -524,11 +1078,8 @@ class AXI3ReadMux(Module):
                             self.slave_port.addr_width,
                             self.slave_port.data_width)
         self.comb += [
-            port.rid.eq(self.slave_port.rid),
-            port.rdata.eq(self.slave_port.rdata),
-            port.rresp.eq(self.slave_port.rresp),
-            port.rlast.eq(self.slave_port.rlast),
-        ]
+            m.eq(s) for m, s in zip(port.slave_signals(),
+                                    self.slave_port.slave_signals())]
 
         self.master_ports.append(port)
         return port
@@ -538,72 +1089,47 @@ class AXI3ReadMux(Module):
         sel = Signal(n)
 
         # Connect the slave port bus lines to the selected master
-        cases = {
-            1 << i: [
-                self.slave_port.arid.eq(self.master_ports[i].arid),
-                self.slave_port.araddr.eq(self.master_ports[i].araddr),
-                self.slave_port.arlen.eq(self.master_ports[i].arlen),
-                self.slave_port.arsize.eq(self.master_ports[i].arsize),
-                self.slave_port.arburst.eq(self.master_ports[i].arburst),
-                self.slave_port.arlock.eq(self.master_ports[i].arlock),
-                self.slave_port.arcache.eq(self.master_ports[i].arcache),
-                self.slave_port.arprot.eq(self.master_ports[i].arprot),
-                self.slave_port.arvalid.eq(self.master_ports[i].arvalid),
-                self.slave_port.rready.eq(self.master_ports[i].rready),
-            ]
-            for i in range(n)
-        }
-        cases["default"] = [
-                self.slave_port.arid.eq(0),
-                self.slave_port.araddr.eq(0),
-                self.slave_port.arlen.eq(0),
-                self.slave_port.arsize.eq(0),
-                self.slave_port.arburst.eq(0),
-                self.slave_port.arlock.eq(0),
-                self.slave_port.arcache.eq(0),
-                self.slave_port.arprot.eq(0),
-                self.slave_port.arvalid.eq(0),
-                self.slave_port.rready.eq(0),
-        ]
-        self.comb += Case(sel, cases)
-
-        # Connect slave-driven handshake to appropriate master
-        self.comb += [
-            self.master_ports[i].arready.eq(
-                Mux(sel[i], self.slave_port.arready, 0))
-            for i in range(n)]
+        buses = [port.master_signals() for port in self.master_ports]
         self.comb += [
-            self.master_ports[i].rvalid.eq(
-                Mux(sel[i], self.slave_port.rvalid, 0))
-            for i in range(n)]
+            s.eq(_one_hot_select(sel, lines))
+            for s, lines in zip(self.slave_port.master_signals(),
+                                zip(*buses))]
 
-        # Make an array of input ARVALID which we will monitor to transition
-        arvalid_arr = Array(port.arvalid for port in self.master_ports)
+        # Connect slave-driven handshakes to appropriate master
+        handshakes = self.slave_port.slave_handshakes()
+        self.comb += [
+            m.eq(Mux(sel[i], s, 0))
+            for i, port in enumerate(self.master_ports)
+            for m, s in zip(port.slave_handshakes(), handshakes)]
 
         # Manage interconnect state
         self.submodules.fsm = FSM(reset_state="IDLE")
 
-        # If the currently selected master asserts ARVALID, we'll leave it
-        # selected and go to BUSY state. Otherwise, we check all other
-        # masters in insertion order, select the first one which has asserted
-        # ARVALID, and go to BUSY.  If no masters have asserted ARVALID we
-        # remain in IDLE.
-        idle_check = If(self.slave_port.arvalid, NextState("BUSY"))
-        for i in range(n):
-            idle_check = idle_check.Elif(
-                arvalid_arr[i],
-                NextValue(sel, 1 << i),
-                NextState("BUSY"))
-
-        self.fsm.act("IDLE", idle_check)
+        # In IDLE we select the next master to assert ARVALID, and go to
+        # BUSY. If no masters have asserted ARVALID we remain in IDLE.
+        self.fsm.act("IDLE", _round_robin(
+            sel, [port.arvalid for port in self.master_ports],
+            self.slave_port.arvalid))
+
+        # Masters may issue further read addresses before earlier bursts
+        # have completed, so count the transactions in flight.
+        ar_fire = Signal()
+        r_done = Signal()
+        outstanding = Signal(4)
+        self.comb += [
+            ar_fire.eq(self.slave_port.arvalid & self.slave_port.arready),
+            r_done.eq(self.slave_port.rlast &
+                      self.slave_port.rvalid &
+                      self.slave_port.rready),
+        ]
+        self.sync += outstanding.eq(outstanding + ar_fire - r_done)
 
-        # The current read transaction will finish when the slave is
-        # asserting RLAST and RVALID, and the master asserts RREADY.
+        # The current read transactions will finish when the slave is
+        # asserting RLAST and RVALID, and the master asserts RREADY, for
+        # the last outstanding read.
         self.fsm.act(
             "BUSY",
-            If(self.slave_port.rlast &
-               self.slave_port.rvalid &
-               self.slave_port.rready,
+            If(r_done & ~ar_fire & (outstanding == 1),
                NextState("IDLE"))
         )
 
@@ -612,15 +1138,48 @@ class AXI3WriteMux(Module):
     """
     AXI3 multi-master single-slave write multiplexer.
     """
-    def __init__(self, slave_port):
+    def __init__(self, slave_port, register_slave=False):
         """
         `slave_port` is an AXI3WritePort connected to a slave device.
         This module will drive its master-driven signals from one
         of the attached masters.
+        If `register_slave` is set, the AW and W channels to the slave are
+        registered, adding a cycle of latency to each write but taking the
+        multiplexer out of the path to the slave.
         """
-        self.slave_port = slave_port
         self.master_ports = []
 
+        if not register_slave:
+            self.slave_port = slave_port
+            return
+
+        # Multiplex onto our own port, and register its AW and W channels
+        # onto the slave port, passing the B channel straight through.
+        port = AXI3WritePort(slave_port.id_width, slave_port.addr_width,
+                             slave_port.data_width)
+        self.slave_port = port
+        self.submodules.aw_slice = _RegisterSlice(
+            Cat(port.awid, port.awaddr, port.awlen, port.awsize,
+                port.awburst, port.awlock, port.awcache, port.awprot),
+            port.awvalid, port.awready,
+            Cat(slave_port.awid, slave_port.awaddr, slave_port.awlen,
+                slave_port.awsize, slave_port.awburst, slave_port.awlock,
+                slave_port.awcache, slave_port.awprot),
+            slave_port.awvalid, slave_port.awready)
+        self.submodules.w_slice = _RegisterSlice(
+            Cat(port.wid, port.wdata, port.wstrb, port.wlast),
+            port.wvalid, port.wready,
+            Cat(slave_port.wid, slave_port.wdata, slave_port.wstrb,
+                slave_port.wlast),
+            slave_port.wvalid, slave_port.wready)
+        self.comb += [
+            m.eq(s) for m, s in zip(port.slave_signals(),
+                                    slave_port.slave_signals())]
+        self.comb += [
+            port.bvalid.eq(slave_port.bvalid),
+            slave_port.bready.eq(port.bready),
+        ]
+
     def add_master(self):
         """
         Creates a new AXI3WritePort and returns it. The slave lines on the
@@ -631,9 +1190,8 @@ class AXI3WriteMux(Module):
                              self.slave_port.addr_width,
                              self.slave_port.data_width)
         self.comb += [
-            port.bid.eq(self.slave_port.bid),
-            port.bresp.eq(self.slave_port.bresp),
-        ]
+            m.eq(s) for m, s in zip(port.slave_signals(),
+                                    self.slave_port.slave_signals())]
 
         self.master_ports.append(port)
         return port
@@ -643,84 +1201,44 @@ class AXI3WriteMux(Module):
         sel = Signal(n)
 
         # Connect the slave port bus lines to the selected master
-        cases = {
-            1 << i: [
-                self.slave_port.awid.eq(self.master_ports[i].awid),
-                self.slave_port.awaddr.eq(self.master_ports[i].awaddr),
-                self.slave_port.awlen.eq(self.master_ports[i].awlen),
-                self.slave_port.awsize.eq(self.master_ports[i].awsize),
-                self.slave_port.awburst.eq(self.master_ports[i].awburst),
-                self.slave_port.awlock.eq(self.master_ports[i].awlock),
-                self.slave_port.awcache.eq(self.master_ports[i].awcache),
-                self.slave_port.awprot.eq(self.master_ports[i].awprot),
-                self.slave_port.awvalid.eq(self.master_ports[i].awvalid),
-                self.slave_port.wid.eq(self.master_ports[i].wid),
-                self.slave_port.wdata.eq(self.master_ports[i].wdata),
-                self.slave_port.wstrb.eq(self.master_ports[i].wstrb),
-                self.slave_port.wlast.eq(self.master_ports[i].wlast),
-                self.slave_port.wvalid.eq(self.master_ports[i].wvalid),
-                self.slave_port.bready.eq(self.master_ports[i].bready),
-            ]
-            for i in range(n)
-        }
-        cases["default"] = [
-                self.slave_port.awid.eq(0),
-                self.slave_port.awaddr.eq(0),
-                self.slave_port.awlen.eq(0),
-                self.slave_port.awsize.eq(0),
-                self.slave_port.awburst.eq(0),
-                self.slave_port.awlock.eq(0),
-                self.slave_port.awcache.eq(0),
-                self.slave_port.awprot.eq(0),
-                self.slave_port.awvalid.eq(0),
-                self.slave_port.wid.eq(0),
-                self.slave_port.wdata.eq(0),
-                self.slave_port.wstrb.eq(0),
-                self.slave_port.wlast.eq(0),
-                self.slave_port.wvalid.eq(0),
-                self.slave_port.bready.eq(0),
-        ]
-        self.comb += Case(sel, cases)
-
-        # Connect slave-driven handshake to appropriate master
-        self.comb += [
-            self.master_ports[i].awready.eq(
-                Mux(sel[i], self.slave_port.awready, 0))
-            for i in range(n)]
-        self.comb += [
-            self.master_ports[i].wready.eq(
-                Mux(sel[i], self.slave_port.wready, 0))
-            for i in range(n)]
+        buses = [port.master_signals() for port in self.master_ports]
         self.comb += [
-            self.master_ports[i].bvalid.eq(
-                Mux(sel[i], self.slave_port.bvalid, 0))
-            for i in range(n)]
+            s.eq(_one_hot_select(sel, lines))
+            for s, lines in zip(self.slave_port.master_signals(),
+                                zip(*buses))]
 
-        # Make an array of input AWVALID which we will monitor to transition
-        awvalid_arr = Array(port.awvalid for port in self.master_ports)
+        # Connect slave-driven handshakes to appropriate master
+        handshakes = self.slave_port.slave_handshakes()
+        self.comb += [
+            m.eq(Mux(sel[i], s, 0))
+            for i, port in enumerate(self.master_ports)
+            for m, s in zip(port.slave_handshakes(), handshakes)]
 
         # Manage interconnect state
         self.submodules.fsm = FSM(reset_state="IDLE")
 
-        # If the currently selected master asserts AWVALID, we'll leave it
-        # selected and go to BUSY state. Otherwise, we check all other
-        # masters in insertion order, select the first one which has asserted
-        # AWVALID, and go to BUSY.  If no masters have asserted AWVALID we
-        # remain in IDLE.
-        idle_check = If(self.slave_port.awvalid, NextState("BUSY"))
-        for i in range(n):
-            idle_check = idle_check.Elif(
-                awvalid_arr[i],
-                NextValue(sel, 1 << i),
-                NextState("BUSY"))
-
-        self.fsm.act("IDLE", idle_check)
+        # In IDLE we select the next master to assert AWVALID, and go to
+        # BUSY. If no masters have asserted AWVALID we remain in IDLE.
+        self.fsm.act("IDLE", _round_robin(
+            sel, [port.awvalid for port in self.master_ports],
+            self.slave_port.awvalid))
+
+        # Masters may issue further write addresses before earlier bursts
+        # have completed, so count the transactions in flight.
+        aw_fire = Signal()
+        b_fire = Signal()
+        outstanding = Signal(4)
+        self.comb += [
+            aw_fire.eq(self.slave_port.awvalid & self.slave_port.awready),
+            b_fire.eq(self.slave_port.bvalid & self.slave_port.bready),
+        ]
+        self.sync += outstanding.eq(outstanding + aw_fire - b_fire)
 
-        # The current read transaction will finish when the slave is
-        # asserting BVALID, and the master asserts BREADY.
+        # The current write transactions will finish when the slave is
+        # asserting BVALID and the master asserts BREADY for the last
+        # outstanding write.
         self.fsm.act(
             "BUSY",
-            If(self.slave_port.bvalid &
-               self.slave_port.bready,
+            If(b_fire & ~aw_fire & (outstanding == 1),
                NextState("IDLE"))
         )
@@ -4,8 +4,10 @@ Shape a bitstream into oversampled pulses.
 Copyright 2017 Adam Greig
 """
 
+from functools import lru_cache
+
 import numpy as np
-from migen import Module, Signal, ClockDomain, Cat, Memory
+from migen import Module, Signal, ClockDomain, Cat, Memory, Mux
 from migen.fhdl.decorators import ClockDomainsRenamer
 
 
@@ -40,22 +42,13 @@ class PRBSShaper(Module):
         self.prbs.sync += Cat(self.sr).eq(Cat(self.prbs.x, self.sr))
 
         # Prepare the memory contents.
-        # We convert the signed integers to unsigned words, and we store
-        # the negative version of each coefficient immediately before the
-        # original version as well. They are then split into 8 ROMs of 8
-        # coefficients each.
-        coeffs = [[] for _ in range(8)]
-        for cset in coefficients:
-            for idx, c in enumerate(cset):
-                # Take the positive and negative versions of c,
-                # and convert both to signed positive integer representation.
-                cp, cm = c, -c
-                if cp < 0:
-                    cp += 512
-                if cm < 0:
-                    cm += 512
-                coeffs[idx//8].append(cm)
-                coeffs[idx//8].append(cp)
+        # We convert the signed integers to unsigned 9 bit words and pack
+        # the coefficient for each of the 8 taps side by side into one
+        # 72 bit word, so the array is indexed by [set, coefficient] and
+        # tap `i` occupies bits 9*i to 9*i+8.
+        c = np.asarray(coefficients, dtype=np.int16).reshape(-1, 8, 8)
+        taps = (c & 0x1FF).transpose(0, 2, 1).reshape(-1, 8).tolist()
+        words = [sum(v << (9*i) for i, v in enumerate(t)) for t in taps]
 
         # Make a counter for the ROM addresses, which is offset from the
         # PRBS shift register clock so that ctr runs through 0 to 7 for each
@@ -63,24 +56,30 @@ class PRBSShaper(Module):
         self.ctr = Signal(3, reset=4)
         self.sync += self.ctr.eq(self.ctr + 1)
 
-        # Set up 8 ROMs
-        self.roms = [Memory(9, 512, coeffs[i]) for i in range(8)]
-        self.specials += self.roms
-        self.ports = [self.roms[i].get_port() for i in range(8)]
-        self.specials += self.ports
+        # Set up a single ROM read by all 8 taps at once. Each tap's PRBS
+        # bit is delayed to line up with the ROM output and selects
+        # whether the coefficient is negated.
+        self.rom = Memory(9*8, 256, words)
+        self.port = self.rom.get_port()
+        self.specials += [self.rom, self.port]
+        self.comb += self.port.adr.eq(Cat(self.ctr, setsel))
+        self.sr_d = Signal(8)
+        self.sync += self.sr_d.eq(self.sr)
         self.portsout = [Signal((9, True)) for _ in range(8)]
-        for idx, port in enumerate(self.ports):
-            self.comb += port.adr.eq(Cat(self.sr[idx], self.ctr, setsel))
-            self.sync += self.portsout[idx].eq(port.dat_r)
+        for idx, out in enumerate(self.portsout):
+            coeff = Signal((9, True))
+            self.comb += coeff.eq(self.port.dat_r[idx*9:(idx+1)*9])
+            self.sync += out.eq(Mux(self.sr_d[idx], coeff, -coeff))
 
-        # Adder tree to output
+        # Adder tree to output. Only the ROM outputs and the final sum are
+        # registered; the two inner levels are combinational.
         self.adders0 = [Signal((10, True)) for _ in range(4)]
         for idx, adder in enumerate(self.adders0):
-            self.sync += adder.eq(
+            self.comb += adder.eq(
                 self.portsout[idx*2] + self.portsout[idx*2 + 1])
         self.adders1 = [Signal((11, True)) for _ in range(2)]
         for idx, adder in enumerate(self.adders1):
-            self.sync += adder.eq(
+            self.comb += adder.eq(
                 self.adders0[idx*2] + self.adders0[idx*2 + 1])
         self.x = Signal((12, True))
         self.sync += self.x.eq(self.adders1[0] + self.adders1[1])
@@ -93,24 +92,34 @@ class PRBSShaper(Module):
         shapes, in order, and if there were less than 32 sets, also adds
         a very simple rectangular pulse shape to the end of the list.
         """
-        T = 8
-        cc = []
-        for β in betas:
-            t = np.arange(-32, 32)
-            if β != 0.0:
-                replace = np.where(np.abs(t) == T/(2*β))
-                t[replace] = 0
-            c = 1/T * np.sinc(t/T) * np.cos(np.pi * β * t/T)/(1-(2*β*t/T)**2)
-            if β != 0.0:
-                c[replace] = np.pi/(4*T) * np.sinc(1/(2*β))
-            cc.append((c * T * 254).astype(np.int).tolist())
-        if len(cc) < 32:
-            cc.append([0]*30 + [254]*4 + [0]*30)
-        return cls(prbs, setsel, cc)
+        return cls(prbs, setsel, _rcf_coefficients(tuple(betas)))
+
+
+@lru_cache(maxsize=None)
+def _rcf_coefficients(betas):
+    """
+    Compute the PRBSShaper coefficient sets for raised cosine pulses with
+    rolloff coefficients `betas` (a tuple), plus the rectangular pulse if
+    there is room for it. Returned as a tuple of tuples as it is cached.
+    """
+    # Evaluate every pulse shape at once, with one row per β. Where the
+    # denominator is zero we use the limit of the pulse instead, which
+    # only happens for nonzero β.
+    T = 8
+    t = np.arange(-32, 32) / T
+    β = np.asarray(betas, dtype=float)[:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        num = np.sinc(t) * np.cos(np.pi * β * t)
+        den = 1 - (2 * β * t)**2
+        lim = np.pi/4 * np.sinc(1/(2*β))
+        c = 1/T * np.where(np.isclose(den, 0), lim, num/den)
+    cc = (c * T * 254).astype(np.int64).tolist()
+    if len(cc) < 32:
+        cc.append([0]*30 + [254]*4 + [0]*30)
+    return tuple(tuple(c) for c in cc)
 
 
 def test_prbs_shaper():
-    import scipy.signal
     from .prbs import PRBS
     from migen.sim import run_simulation
 
@@ -125,7 +134,7 @@ def test_prbs_shaper():
     t[replace] = 0
     c = 1/T * np.sinc(t/T) * np.cos(np.pi * β * t/T)/(1-(2*β*t/T)**2)
     c[replace] = np.pi/(4*T) * np.sinc(1/(2*β))
-    c = (c * T * 254).astype(np.int).tolist()
+    c = (c * T * 254).astype(int).tolist()
 
     # We'll only use a single coefficient set here
     setsel = Signal(5, reset=0)
@@ -142,7 +151,7 @@ def test_prbs_shaper():
             shaped.append((yield shaper.x))
             yield
 
-        # Use scipy to filter the same PRBS through the same impulse response,
+        # Use numpy to filter the same PRBS through the same impulse response,
         # and check the results match. We turn the PRBS into a corresponding
         # sequence with +-1 pulses at the midpoint of each longer bit period
         # in the simulated prbs output, and we have to compensate for the
@@ -151,7 +160,7 @@ def test_prbs_shaper():
         x = 2*np.array(prbs) - 1
         y = np.zeros(x.size)
         y[4::8] = x[4::8]
-        f = scipy.signal.lfilter(b, [1], y)
-        assert np.all(f[60:-13] == shaped[73:])
+        f = np.convolve(y, b)[:y.size]
+        assert np.all(f[60:-11] == shaped[71:])
 
     run_simulation(shaper, tb(), clocks={"sys": 10, "prbsclk": 80})
@@ -4,8 +4,7 @@ Delay incoming words by a configurable count, using a block RAM.
 Copyright 2017 Adam Greig
 """
 
-import pytest
-from migen import Module, Signal, Memory, Array
+from migen import Module, Signal, Memory, Cat, If
 
 
 class RAMDelayLine(Module):
@@ -28,6 +27,19 @@ class RAMDelayLine(Module):
         self.ctr = Signal(9)
         self.sync += self.ctr.eq(self.ctr + 1)
 
+        # The read address follows the write counter `delay - 2` behind,
+        # so it's kept in its own counter and only recomputed from `ctr`
+        # when `delay` changes, keeping the subtraction off the RAM address.
+        self.rdctr = Signal(9, reset=2)
+        self.delay = Signal(delay.nbits)
+        self.sync += self.delay.eq(delay)
+        self.sync += If(
+            delay != self.delay,
+            self.rdctr.eq(self.ctr - delay + 3)
+        ).Else(
+            self.rdctr.eq(self.rdctr + 1)
+        )
+
         # Create the RAM
         self.ram = Memory(16, 512)
         self.inport = self.ram.get_port(write_capable=True)
@@ -38,7 +50,7 @@ class RAMDelayLine(Module):
         self.comb += self.inport.adr.eq(self.ctr)
         self.comb += self.inport.dat_w.eq(sample)
         self.comb += self.inport.we.eq(1)
-        self.comb += self.outport.adr.eq(self.ctr - delay + 2)
+        self.comb += self.outport.adr.eq(self.rdctr)
         self.comb += self.x.eq(self.outport.dat_r)
 
 
@@ -57,49 +69,54 @@ class BitDelayLine(Module):
         """
         self.x = Signal()
 
-        # Create the shift register. We'll make it `max_delay+1` so we can
-        # store the current input at index 0 too.
-        max_delay = max_delay + 1
-        self.sr = Array(Signal() for _ in range(max_delay))
-        self.comb += self.sr[0].eq(bit)
-        self.sync += [self.sr[i].eq(self.sr[i-1]) for i in range(1, max_delay)]
-        self.comb += self.x.eq(self.sr[delay])
+        # Create the shift register, holding the previous `max_delay` bits,
+        # and select the output from it with the current input prepended so
+        # that a delay of 0 is also possible.
+        self.sr = Signal(max_delay)
+        self.sync += self.sr.eq(Cat(bit, self.sr[:-1]))
+        self.comb += self.x.eq(Cat(bit, self.sr).part(delay, 1))
 
 
-@pytest.mark.parametrize("delay", [3, 4, 5, 6])
-def test_ram_delay_line(delay):
+def test_ram_delay_line():
     from migen.sim import run_simulation
+    delays = [3, 4, 5, 6]
     source = Signal(12)
-    delay_sig = Signal(12, reset=delay)
-    delay_line = RAMDelayLine(source, delay_sig)
-    outputs = []
+    dut = Module()
+    lines = [RAMDelayLine(source, Signal(12, reset=d)) for d in delays]
+    dut.submodules += lines
+    outputs = [[] for _ in delays]
 
     def tb():
         for step in range(100):
             (yield source.eq(step))
-            outputs.append((yield delay_line.x))
+            for line, out in zip(lines, outputs):
+                out.append((yield line.x))
             yield
 
-        assert outputs == [0]*delay + list(range(100 - delay))
+        for delay, out in zip(delays, outputs):
+            assert out == [0]*delay + list(range(100 - delay))
 
-    run_simulation(delay_line, tb())
+    run_simulation(dut, tb())
 
 
-@pytest.mark.parametrize("delay", [0, 1, 2, 3, 4, 5, 6])
-def test_bit_delay_line(delay):
+def test_bit_delay_line():
     from migen.sim import run_simulation
+    delays = [0, 1, 2, 3, 4, 5, 6]
     source = Signal()
-    delay_sig = Signal(4, reset=delay)
-    delay_line = BitDelayLine(source, 6, delay_sig)
+    dut = Module()
+    lines = [BitDelayLine(source, 6, Signal(4, reset=d)) for d in delays]
+    dut.submodules += lines
     bits = [1, 1, 0, 1, 0, 1, 0, 0, 1, 0, 0, 1, 1, 0, 1, 1]
-    out = []
+    outputs = [[] for _ in delays]
 
     def tb():
         for bit in bits:
             (yield source.eq(bit))
             yield
-            out.append((yield delay_line.x))
+            for line, out in zip(lines, outputs):
+                out.append((yield line.x))
 
-        assert out == [0]*delay + bits[:len(bits)-delay]
+        for delay, out in zip(delays, outputs):
+            assert out == [0]*delay + bits[:len(bits)-delay]
 
-    run_simulation(delay_line, tb())
+    run_simulation(dut, tb())
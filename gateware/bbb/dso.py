@@ -5,7 +5,7 @@ Copyright 2018 Adam Greig
 """
 
 import numpy as np
-from migen import Module, Signal, Memory, FSM, Cat, NextValue, NextState, If
+from migen import Module, Signal, Memory, FSM, Mux, NextValue, NextState, If
 from migen import run_simulation
 
 
@@ -15,7 +15,8 @@ class DSO(Module):
         A virtual digital-storage-scope.
         Stores overlapping lines of samples, cleared occasionally.
 
-        Memory is arranged into 256 rows of 64 columns.
+        Memory is arranged into 256 rows of 64 columns, one row per word
+        with column `c` held in bit `c`.
         When `line` is pulsed, 64 successive values of sample are read,
         and the row corresponding to the value of sample is set to 1.
         When `frame` is pulsed, all memory is zeroed.
@@ -28,30 +29,74 @@ class DSO(Module):
 
         Outputs:
         `readport`: a Memory port you can read to access the persisted data.
-                    The address is 6 bits of column in the LSb and 8 bits
-                    of row in the MSb. (0, 0) is top-left. Sample values of
-                    0 are drawn in the 128th row.
+                    The address is the 8-bit row and each read returns all
+                    64 columns of that row, column 0 in the LSb.
+                    (0, 0) is top-left. Sample values of 0 are drawn in the
+                    128th row.
         """
-        self.mem = Memory(1, 64*256)
+        # The UI's readport, the read-modify-write read port and the write
+        # port make three ports, more than an M9K has, so Quartus
+        # duplicates the array: 4 M9Ks instead of the 2 a 16384x1 memory
+        # needs. Doing the RMW through one read/write port would need two
+        # cycles per sample, and the UI owns the other port.
+        self.mem = Memory(64, 256)
         self.readport = self.mem.get_port()
+        self.rmwport = self.mem.get_port()
         self.writeport = self.mem.get_port(write_capable=True)
-        self.specials += [self.mem, self.readport, self.writeport]
+        self.specials += [
+            self.mem, self.readport, self.rmwport, self.writeport]
 
         self.rowctr = Signal(8)
         self.colctr = Signal(6)
-        self.comb += self.writeport.adr.eq(Cat(self.colctr, self.rowctr))
 
         self.submodules.fsm = FSM(reset_state="WAIT")
 
-        self.comb += self.writeport.we.eq(
-            self.fsm.ongoing("CLEAR") | self.fsm.ongoing("WRITELINE"))
-        self.comb += self.writeport.dat_w.eq(
-            self.fsm.ongoing("WRITELINE"))
+        # Each sample is written with a read-modify-write of its row:
+        # the row is read while the sample is taken, and the following
+        # cycle the sample's column bit is set in the readback and the row
+        # written back. Consecutive samples may land in the same row, in
+        # which case the readback predates the previous write and the
+        # previously written word is used instead.
+        wrow = Signal(8)
+        wcol = Signal(6)
+        wvalid = Signal()
+        prevrow = Signal(8)
+        prevdata = Signal(64)
+        prevvalid = Signal()
+        readback = Signal(64)
+        merged = Signal(64)
+        self.comb += [
+            self.rmwport.adr.eq(127 - sample),
+            readback.eq(Mux(prevvalid & (prevrow == wrow),
+                            prevdata, self.rmwport.dat_r)),
+            merged.eq(readback | (1 << wcol)),
+        ]
+        self.sync += [
+            wrow.eq(127 - sample),
+            wcol.eq(self.colctr),
+            wvalid.eq(self.fsm.ongoing("WRITELINE")),
+            prevrow.eq(wrow),
+            prevdata.eq(merged),
+            prevvalid.eq(wvalid),
+        ]
+
+        # Clearing takes priority over a write still in the pipeline,
+        # which would be zeroed anyway.
+        self.comb += [
+            self.writeport.we.eq(self.fsm.ongoing("CLEAR") | wvalid),
+            If(
+                self.fsm.ongoing("CLEAR"),
+                self.writeport.adr.eq(self.rowctr),
+                self.writeport.dat_w.eq(0),
+            ).Else(
+                self.writeport.adr.eq(wrow),
+                self.writeport.dat_w.eq(merged),
+            ),
+        ]
 
         self.fsm.act(
             "CLEAR",
-            NextValue(self.colctr, self.colctr + 1),
-            If(self.colctr == 63, NextValue(self.rowctr, self.rowctr + 1)),
+            NextValue(self.rowctr, self.rowctr + 1),
             If(self.rowctr == 255, NextState("WAIT")),
         )
 
@@ -65,7 +110,6 @@ class DSO(Module):
 
         self.fsm.act(
             "WRITELINE",
-            NextValue(self.rowctr, 127 - sample),
             NextValue(self.colctr, self.colctr + 1),
             If(self.colctr == 63, NextState("WAIT"))
             .Elif(frame == 1, NextState("CLEAR"))
@@ -82,11 +126,11 @@ def test_dso():
         yield
 
         # Clear
-        # (yield frame.eq(1))
-        # yield
-        # (yield frame.eq(0))
-        # for _ in range(64*256 + 10):
-        #   # yield
+        (yield frame.eq(1))
+        yield
+        (yield frame.eq(0))
+        for _ in range(256 + 10):
+            yield
 
         target = np.zeros((64, 256), dtype=np.uint8)
 
@@ -118,8 +162,9 @@ def test_dso():
         # Dump memory contents
         mem = np.empty((64, 256), dtype=np.uint8)
         for row in range(256):
+            word = (yield dso.mem[row])
             for col in range(64):
-                mem[col, row] = (yield dso.mem[row << 6 | col])
+                mem[col, row] = (word >> col) & 1
             print(f'{row:03d}', ''.join(f'{x}' for x in mem[:, row]))
         assert np.all(mem == target)
 
@@ -2,20 +2,19 @@ from PIL import Image, ImageFont, ImageDraw
 import numpy as np
 
 
-def draw_letter(c):
-    image = Image.new("1", (8, 16), 0)
+def make_font():
+    # Load the font once and reuse a single 8x16 cell for every character,
+    # clearing it before each is drawn so glyphs are clipped to the cell.
     font = ImageFont.truetype("/home/adam/.fonts/Inconsolata.otf", 13)
+    image = Image.new("1", (8, 16), 0)
     draw = ImageDraw.Draw(image)
     draw.fontmode = "1"
-    draw.text((0, 1), c, 1, font=font)
-    return list(image.getdata())
-
-
-def make_font():
-    font = []
+    pixels = []
     for x in range(128):
-        font += draw_letter(chr(x))
-    return font
+        draw.rectangle((0, 0, 7, 15), fill=0)
+        draw.text((0, 1), chr(x), 1, font=font)
+        pixels += image.getdata()
+    return pixels
 
 
 if __name__ == "__main__":
@@ -5,7 +5,7 @@ Copyright 2017 Adam Greig
 """
 
 import numpy as np
-from migen import Signal, Module, Memory
+from migen import Signal, Module, Memory, Mux
 
 
 class NCO(Module):
@@ -26,22 +26,35 @@ class NCO(Module):
         self.pa = Signal(n)
         self.sync += self.pa.eq(self.pa + fcw + fm)
 
-        # Phase to amplitude converter
-        t = np.linspace(0, 2*np.pi, 2**m)
-        s = np.round(np.sin(t) * (2**(p-1) - 1)).astype(np.int)
-        s[s < 0] += 2**p
-        self.rom = Memory(p, 2**m, s.tolist())
+        # Phase to amplitude converter. Only the first quarter period of
+        # sine is stored, as unsigned p-1 bit words including the peak at
+        # the end, and the other quadrants are recovered by mirroring the
+        # address and negating the output.
+        q = 2**(m-2)
+        t = np.linspace(0, np.pi/2, q + 1)
+        s = np.round(np.sin(t) * (2**(p-1) - 1)).astype(np.int64)
+        self.rom = Memory(p-1, q + 1, s.tolist())
         self.port = self.rom.get_port()
-        self.comb += self.port.adr.eq(self.pa[n-m:n] + pm)
         self.specials += [self.rom, self.port]
+        self.phase = Signal(m)
+        self.comb += self.phase.eq(self.pa[n-m:n] + pm)
+        low = self.phase[:m-2]
+        mirror = self.phase[m-2]
+        self.comb += self.port.adr.eq(Mux(mirror, q - low, low))
+        negate = Signal()
+        self.sync += negate.eq(self.phase[m-1])
 
         # Output
         self.w = Signal((p, True))
-        self.sync += self.w.eq(self.port.dat_r)
-        self.y = Signal((2*p, True))
-        self.sync += self.y.eq(am * self.w)
+        self.sync += self.w.eq(Mux(negate, -self.port.dat_r, self.port.dat_r))
+        # Register `am` so both multiplier inputs come straight from
+        # registers, letting the multiply map onto a pipelined DSP block.
+        self.am_r = Signal.like(am)
+        self.sync += self.am_r.eq(am)
+        # Only the top p bits of the product are kept, so just those are
+        # registered as the output.
         self.x = Signal((p, True))
-        self.comb += self.x.eq(self.y[p:])
+        self.sync += self.x.eq((self.am_r * self.w)[p:2*p])
 
 
 def test_nco():
@@ -58,8 +71,9 @@ def test_nco():
         for _ in range(1024):
             values.append((yield nco.x))
             yield
-        expected = np.sin(np.linspace(0, 2*np.pi, 1024)) * (2**15 - 1)
-        expected = np.round(expected).astype(np.int) * (2**16 - 1)
+        t = np.linspace(0, 2*np.pi, 1024, endpoint=False)
+        expected = np.sin(t) * (2**15 - 1)
+        expected = np.round(expected).astype(np.int64) * (2**16 - 1)
         expected >>= 16
         assert values[3:] == expected.tolist()[:-3]
 
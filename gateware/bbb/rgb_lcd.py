@@ -4,8 +4,10 @@
 Copyright 2017 Adam Greig
 """
 
-from migen import Module, Signal, Cat, If, ClockDomain, Memory, Array, Cat
+from migen import Module, Signal, Cat, If, ClockDomain, Memory, Cat
 from migen import FSM, NextValue, NextState, Mux
+from migen.fhdl.bitcontainer import bits_for
+from migen.genlib.cdc import MultiReg
 from .axi3 import AXI3ToBRAM, BRAMToAXI3
 
 
@@ -42,26 +44,47 @@ class RGBLCD(Module):
         pcount = Signal(max=cols+hbp+hfp+1)
         hcount = Signal(max=rows+vbp+vfp+1)
 
-        # Make a BRAM to store one line worth
-        bram = Memory(32, cols)
+        # Make a BRAM to store two lines worth. Each line is displayed from
+        # one half while the next line is fetched into the other half, with
+        # `line_sel` swapping the halves at the start of every line.
+        colbits = bits_for(cols - 1)
+        bram = Memory(32, 2**(colbits + 1))
         bram_rp = bram.get_port()
         bram_wp = bram.get_port(write_capable=True)
         self.specials += [bram, bram_rp, bram_wp]
+        line_sel = Signal()
+        self.sync.pclk += If(pcount == cols + hbp + hfp - 1,
+                             line_sel.eq(~line_sel))
 
         # Pixel data is the output of the BRAM at the current pixel count,
-        # adjusted to compensate for the back porch and memory read latency
-        self.comb += bram_rp.adr.eq(pcount - hbp - 1)
+        # adjusted to compensate for the back porch and memory read latency.
+        # The address is kept in its own counter, stepped alongside pcount,
+        # so no subtractor sits in front of the BRAM.
+        rdaddr_start = (-hbp - 1) % 2**colbits
+        rdaddr = Signal(colbits, reset=rdaddr_start)
+        self.sync.pclk += If(
+            pcount == cols + hbp + hfp - 1,
+            rdaddr.eq(rdaddr_start)
+        ).Else(
+            rdaddr.eq(rdaddr + 1)
+        )
+        self.comb += bram_rp.adr.eq(Cat(rdaddr, line_sel))
         self.comb += lcd.data.eq(bram_rp.dat_r[0:24])
 
-        # Set up an AXI3 master to read data into the BRAM when triggered
-        # by the HSYNC signal
+        # Set up an AXI3 master to read the following line into the other
+        # half of the BRAM when triggered by the HSYNC signal, giving it a
+        # whole line period to complete.
         axitrig = Signal()
         self.comb += axitrig.eq((lcd.hsync == 0)
-                                & (hcount >= vbp) & (hcount < (rows + vbp)))
+                                & (hcount >= vbp - 1)
+                                & (hcount < (rows + vbp - 1)))
         axiaddr = Signal(framebuf.nbits)
-        self.comb += axiaddr.eq(framebuf + (4*cols)*(hcount - vbp))
+        self.comb += axiaddr.eq(framebuf + (4*cols)*(hcount + 1 - vbp))
+        wrbase = Signal(colbits + 1)
+        self.comb += wrbase[colbits].eq(~line_sel)
         axi_to_bram = AXI3ToBRAM(axi3_port, bram_wp, axitrig, axiaddr,
-                                 cols, axi3_burst_length=16)
+                                 cols, axi3_burst_length=16, outstanding=4,
+                                 bram_base=wrbase)
         self.submodules += axi_to_bram
 
         # Count up pclks and hsyncs, resetting at the end of each period
@@ -76,16 +99,29 @@ class RGBLCD(Module):
             .Else(pcount.eq(pcount + 1))
         )
 
-        # Output hsyncs at the start of each line
-        self.sync.pclk += If(pcount == 0,
-                             lcd.hsync.eq(0)).Else(lcd.hsync.eq(1))
-        # Output DE during the active area of each line
-        self.sync.pclk += If((pcount >= hbp) & (pcount < (cols + hbp)) &
-                             (hcount >= vbp) & (hcount < (rows + vbp)),
-                             lcd.de.eq(1)).Else(lcd.de.eq(0))
-        # Output vsyncs at the start of each frame
-        self.sync.pclk += If(hcount == 0,
-                             lcd.vsync.eq(0)).Else(lcd.vsync.eq(1))
+        # The sync and active-area outputs depend only on the counters, so
+        # they are looked up from small ROMs in the pclk domain. Bit 0 of
+        # each word is the sync output and bit 1 marks the active area.
+        # The synchronous read registers the outputs as before.
+        hlut = Memory(2, cols + hbp + hfp, [
+            (i != 0) | ((hbp <= i < cols + hbp) << 1)
+            for i in range(cols + hbp + hfp)])
+        vlut = Memory(2, rows + vbp + vfp, [
+            (i != 0) | ((vbp <= i < rows + vbp) << 1)
+            for i in range(rows + vbp + vfp)])
+        hlut_rp = hlut.get_port(clock_domain="pclk")
+        vlut_rp = vlut.get_port(clock_domain="pclk")
+        self.specials += [hlut, vlut, hlut_rp, vlut_rp]
+        self.comb += [
+            hlut_rp.adr.eq(pcount),
+            vlut_rp.adr.eq(hcount),
+            # Output hsyncs at the start of each line
+            lcd.hsync.eq(hlut_rp.dat_r[0]),
+            # Output DE during the active area of each line
+            lcd.de.eq(hlut_rp.dat_r[1] & vlut_rp.dat_r[1]),
+            # Output vsyncs at the start of each frame
+            lcd.vsync.eq(vlut_rp.dat_r[0]),
+        ]
 
 
 class DoubleBuffer(Module):
@@ -100,7 +136,11 @@ class DoubleBuffer(Module):
         `vsync`: vsync output from LCD
         `drawn`: drawing-complete output from drawer
 
-        Outputs `self.swapped` which pulses whenever the buffers swap.
+        `drawn` is held high once the back buffer has been drawn, and may
+        be released once `self.swapped` has pulsed. Buffers only swap on a
+        vsync, and `self.swapped` pulses in the same cycle that `self.front`
+        and `self.back` first take their new values, so drawing may begin
+        into the new back buffer as soon as it is seen.
         """
         self.swapped = Signal()
         assert framebuf1.nbits == framebuf2.nbits
@@ -110,10 +150,10 @@ class DoubleBuffer(Module):
         sel = Signal()
 
         # Output whichever is the correct address based on the sel line
-        self.sync += self.front.eq(Mux(sel, framebuf1, framebuf2))
-        self.sync += self.back.eq(Mux(sel, framebuf2, framebuf1))
+        self.comb += self.front.eq(Mux(sel, framebuf1, framebuf2))
+        self.comb += self.back.eq(Mux(sel, framebuf2, framebuf1))
 
-        # Shorten hsync pulse
+        # Shorten vsync pulse
         vsync_prev = Signal()
         vsync_pulse = Signal()
         self.sync += vsync_prev.eq(vsync)
@@ -184,18 +224,20 @@ class LCDPatternGenerator(Module):
         self.sync += ty.eq(ts.y >> 4)
         self.sync += tp.eq(ts.pen)
 
+        # The cursor is drawn where |col - tx| < 8 and |row - ty| < 8, i.e.
+        # where the signed differences lie in -7 to 7: either all the bits
+        # above the bottom three are clear, or they are all set and the
+        # bottom three are not all clear.
+        dx = Signal((10, True))
+        dy = Signal((10, True))
         near_tx = Signal()
         near_ty = Signal()
+        self.comb += dx.eq(col - tx)
+        self.comb += dy.eq(row - ty)
         self.comb += near_tx.eq(
-            ((col >= tx) & (col - tx < 8))
-            |
-            ((col <= tx) & (tx - col < 8))
-        )
+            (dx[3:] == 0) | ((dx[3:] == 0b1111111) & (dx[:3] != 0)))
         self.comb += near_ty.eq(
-            ((row >= ty) & (row - ty < 8))
-            |
-            ((row <= ty) & (ty - row < 8))
-        )
+            (dy[3:] == 0) | ((dy[3:] == 0b1111111) & (dy[:3] != 0)))
 
         red = 0b00000000000000000000000011111111
         grn = 0b00000000000000001111111100000000
@@ -203,6 +245,21 @@ class LCDPatternGenerator(Module):
         wte = 0b00000000111111111111111111111111
         blk = 0b00000000000000000000000000000000
 
+        # Whether each column is on the border (bit 1) or on a grid line
+        # (bit 0) is looked up from a table, while the same flags for the
+        # current row are registered once per line. The row only changes
+        # while the column is off-screen, so the register's extra cycle
+        # of latency is never visible.
+        colflags = Memory(2, 512, [
+            ((c in (0, 479)) << 1) | ((c & 0b111) == 0) for c in range(512)])
+        colflags_rp = colflags.get_port(async_read=True)
+        self.specials += [colflags, colflags_rp]
+        self.comb += colflags_rp.adr.eq(col)
+        row_edge = Signal()
+        row_grid = Signal()
+        self.sync += row_edge.eq((row == 0) | (row == 271))
+        self.sync += row_grid.eq((row & 0b111) == 0)
+
         self.comb += If(
             (tp == 0) & near_tx & near_ty,
             data.eq(red)
@@ -210,10 +267,10 @@ class LCDPatternGenerator(Module):
             (tp == 1) & near_tx & near_ty,
             data.eq(blu)
         ).Elif(
-            (col == 0) | (col == 479) | (row == 0) | (row == 271),
+            colflags_rp.dat_r[1] | row_edge,
             data.eq(wte)
         ).Elif(
-            (col & 0b111 == 0) | (row & 0b111 == 0),
+            colflags_rp.dat_r[0] | row_grid,
             data.eq(grn)
         ).Else(
             data.eq(blk)
@@ -235,22 +292,35 @@ class AR1021TouchController(Module):
         clkfreq = 100e6
         interbyte_delay = 50e-6
         spi_clkfreq = 100e3
-        bytedelay = int(clkfreq * interbyte_delay)
         bitdelay = int(clkfreq / spi_clkfreq)//2
+        bytedelay = int(clkfreq * interbyte_delay) // bitdelay + 1
+
+        # All SPI timing is in half SCLK periods, marked by a strobe from a
+        # single free-running counter. The inter-byte delay is counted in
+        # strobes, with one extra since the first may come early.
+        spi_ce = Signal()
+        clkcnt = Signal(max=bitdelay)
+        self.sync += If(
+            clkcnt == bitdelay - 1,
+            clkcnt.eq(0),
+            spi_ce.eq(1),
+        ).Else(
+            clkcnt.eq(clkcnt + 1),
+            spi_ce.eq(0),
+        )
         delaycnt = Signal(max=bytedelay+1)
-        clkcnt = Signal(max=bitdelay+1)
 
-        # Manage accumulating the input data
+        # Manage accumulating the input data. Bits are shifted in from the
+        # top, so once all 40 have arrived the first is in bit 0, and the
+        # low three bits of the bit counter give the position in each byte.
         data = Signal(5*8)
-        data_a = Array(data)
-        bitno = Signal(4)
-        byteno = Signal(3)
+        bitctr = Signal(max=5*8+1)
 
-        # Synchronise inputs
+        # Synchronise inputs through two flip-flops each
         interrupt = Signal()
         miso = Signal()
-        self.sync += interrupt.eq(touchscreen.int)
-        self.sync += miso.eq(touchscreen.miso)
+        self.specials += MultiReg(touchscreen.int, interrupt)
+        self.specials += MultiReg(touchscreen.miso, miso)
 
         self.submodules.fsm = FSM()
         self.fsm.act(
@@ -261,7 +331,7 @@ class AR1021TouchController(Module):
 
             # Reset counters
             NextValue(delaycnt, 0),
-            NextValue(byteno, 0),
+            NextValue(bitctr, 0),
 
             # Transition when we see an interrupt from the controller
             If(interrupt, NextState("WAIT"))
@@ -273,10 +343,8 @@ class AR1021TouchController(Module):
             touchscreen.mosi.eq(0),
 
             # Wait for the inter-byte delay timer
-            NextValue(clkcnt, 0),
-            NextValue(bitno, 0),
-            NextValue(delaycnt, delaycnt + 1),
-            If(delaycnt >= bytedelay, NextState("CLKH"))
+            If(spi_ce, NextValue(delaycnt, delaycnt + 1)),
+            If(delaycnt == bytedelay, NextState("CLKH"))
         )
         self.fsm.act(
             "CLKH",
@@ -286,8 +354,7 @@ class AR1021TouchController(Module):
 
             # Wait for half the SPI clock period
             NextValue(delaycnt, 0),
-            NextValue(clkcnt, clkcnt + 1),
-            If(clkcnt == bitdelay, NextState("READBIT")),
+            If(spi_ce, NextState("READBIT")),
         )
         self.fsm.act(
             "READBIT",
@@ -295,12 +362,9 @@ class AR1021TouchController(Module):
             touchscreen.sclk.eq(0),
             touchscreen.mosi.eq(0),
 
-            # Reset SPI clock counter
-            NextValue(clkcnt, 0),
-
             # Store this bit (at the clock falling edge)
-            NextValue(data_a[byteno*8+bitno], miso),
-            NextValue(bitno, bitno + 1),
+            NextValue(data, Cat(data[1:], miso)),
+            NextValue(bitctr, bitctr + 1),
             NextState("CLKL"),
         )
         self.fsm.act(
@@ -309,13 +373,11 @@ class AR1021TouchController(Module):
             touchscreen.sclk.eq(0),
             touchscreen.mosi.eq(0),
 
-            # Wait for half the SPI clock period, minus one for previous state.
-            If(clkcnt == bitdelay - 1, (
-                NextValue(clkcnt, 0),
-                # Either read the next bit or move on to the next byte.
-                If(bitno < 8, NextState("CLKH"))
-                .Else(NextState("BYTE"))
-            )).Else(NextValue(clkcnt, clkcnt + 1))
+            # Wait for the rest of half the SPI clock period, then either
+            # read the next bit or move on to the next byte.
+            If(spi_ce,
+               If(bitctr[:3] != 0, NextState("CLKH"))
+               .Else(NextState("BYTE")))
         )
         self.fsm.act(
             "BYTE",
@@ -323,9 +385,8 @@ class AR1021TouchController(Module):
             touchscreen.sclk.eq(0),
             touchscreen.mosi.eq(0),
 
-            # Incremenet byte counter, then either read another byte or finish.
-            NextValue(byteno, byteno + 1),
-            If(byteno < 4, NextState("WAIT")).Else(NextState("END"))
+            # Either read another byte or finish.
+            If(bitctr != 5*8, NextState("WAIT")).Else(NextState("END"))
         )
         self.fsm.act(
             "END",
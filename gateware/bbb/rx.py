@@ -5,7 +5,7 @@ Copyright 2017 Adam Greig
 """
 
 import numpy as np
-from migen import Module, Signal, ClockDomain, ClockDomainsRenamer
+from migen import Module, Signal, CEInserter
 from bbb.average import MovingAverage
 from bbb.prbs import PRBSErrorDetector
 from bbb.delayline import BitDelayLine
@@ -32,15 +32,21 @@ class RX(Module):
         self.submodules.delay = BitDelayLine(
             self.sliced, samples_per_bit, sample_delay)
 
-        # Make a 1/max_delay clock for the PRBS
+        # Make a 1/max_delay clock enable for the PRBS, so the PRBS runs in
+        # the same clock domain as the delay line and no clock is generated
+        # in fabric. It is asserted in the cycle just after div[1] rises,
+        # which is when the divided clock used to sample the delay line.
         self.div = Signal(int(np.log2(samples_per_bit)))
         self.sync += self.div.eq(self.div + 1)
-        self.clock_domains.prbsclk = ClockDomain("prbsclk")
-        self.comb += self.prbsclk.clk.eq(self.div[1])
+        self.prbs_ce = Signal()
+        self.comb += self.prbs_ce.eq(self.div[:2] == 0b10)
 
         # Make the PRBS error detector
-        self.submodules.prbsdet = ClockDomainsRenamer("prbsclk")(
+        self.submodules.prbsdet = CEInserter()(
             PRBSErrorDetector(prbs_k, self.delay.x))
+        self.comb += self.prbsdet.ce.eq(self.prbs_ce)
 
-        # Forward the PRBS error signal
-        self.err = self.prbsdet.err
+        # Forward the PRBS error signal, qualified by the clock enable so it
+        # pulses for one cycle per errored bit.
+        self.err = Signal()
+        self.comb += self.err.eq(self.prbsdet.err & self.prbs_ce)
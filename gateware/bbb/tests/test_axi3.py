@@ -1,8 +1,13 @@
+import pytest
+
 from ..axi3 import AXI3ReadPort, AXI3WritePort
 from ..axi3 import AXI3RegReader, AXI3RegWriter
-from ..axi3 import AXI3ToBRAM, BRAMToAXI3
+from ..axi3 import AXI3SlaveReader, AXI3SlaveWriter
+from ..axi3 import AXI3ToBRAM, BRAMToAXI3, AXI3Copy
 from ..axi3 import AXI3ReadMux, AXI3WriteMux
-from ..axi3 import BURST_TYPE_INCR, BURST_SIZE_4, RESP_OKAY, RESP_SLVERR
+from ..axi3 import BURST_TYPE_FIXED, BURST_TYPE_INCR
+from ..axi3 import BURST_SIZE_4, BURST_SIZE_8
+from ..axi3 import RESP_OKAY, RESP_SLVERR
 from migen import Array, Signal, Memory, Module
 from migen.sim import run_simulation
 
@@ -34,10 +39,10 @@ def test_axi3_slave_reader():
         assert (yield port.arready)
         yield port.arvalid.eq(1)
         yield
-        yield
         yield port.arvalid.eq(0)
         yield
         yield
+        yield
         assert (yield port.rvalid)
         assert (yield port.rid == 0x123)
         assert (yield port.rdata == reg0)
@@ -92,10 +97,10 @@ def test_axi3_slave_reader():
         assert (yield port.arready)
         yield port.arvalid.eq(1)
         yield
-        yield
         yield port.arvalid.eq(0)
         yield
         yield
+        yield
         assert (yield port.rvalid)
         assert (yield port.rid == 0x124)
         assert (yield port.rdata == reg0)
@@ -120,10 +125,10 @@ def test_axi3_slave_reader():
         assert (yield port.arready)
         yield port.arvalid.eq(1)
         yield
-        yield
         yield port.arvalid.eq(0)
         yield
         yield
+        yield
         assert (yield port.rvalid)
         assert (yield port.rid == 0x125)
         assert (yield port.rdata == reg2)
@@ -148,10 +153,10 @@ def test_axi3_slave_reader():
         assert (yield port.arready)
         yield port.arvalid.eq(1)
         yield
-        yield
         yield port.arvalid.eq(0)
         yield
         yield
+        yield
         assert (yield port.rvalid)
         assert (yield port.rid == 0x126)
         assert (yield port.rresp == 0b10)
@@ -176,10 +181,10 @@ def test_axi3_slave_reader():
         assert (yield port.arready)
         yield port.arvalid.eq(1)
         yield
-        yield
         yield port.arvalid.eq(0)
         yield
         yield
+        yield
         assert (yield port.rvalid)
         assert (yield port.rid == 0x127)
         assert (yield port.rresp == 0b10)
@@ -194,6 +199,204 @@ def test_axi3_slave_reader():
     run_simulation(axi3sr, tb(), vcd_name="axi3sr.vcd")
 
 
+def test_axi3_slave_reader_outstanding():
+    port = AXI3ReadPort(id_width=12, addr_width=21, data_width=32)
+    regs = [Signal(32, reset=0x1000 + x) for x in range(4)]
+    regfile = Array(regs)
+
+    axi3sr = AXI3RegReader(port, regfile)
+
+    def tb():
+        # Issue two 2-beat bursts back to back, without reading any data.
+        yield port.arlen.eq(2-1)
+        yield port.arsize.eq(BURST_SIZE_4)
+        yield port.arburst.eq(BURST_TYPE_INCR)
+        yield port.arid.eq(0x1)
+        yield port.araddr.eq(0x0)
+        yield port.arvalid.eq(1)
+        yield
+        assert (yield port.arready)
+        yield port.arid.eq(0x2)
+        yield port.araddr.eq(0x8)
+        yield
+        # The first burst starts on the cycle after its address handshake.
+        assert (yield port.rvalid)
+        assert (yield port.arready)
+        yield port.arvalid.eq(0)
+        yield
+        yield
+        yield
+
+        # The first burst is stalled on RREADY, but we can still accept
+        # another address.
+        assert (yield port.rvalid)
+        assert (yield port.arready)
+
+        # Both bursts are then returned without any gap between them.
+        yield port.rready.eq(1)
+        yield
+        beats = []
+        for _ in range(8):
+            if (yield port.rvalid):
+                beats.append(((yield port.rid), (yield port.rdata),
+                              (yield port.rlast)))
+            yield
+        assert beats == [(0x1, 0x1000, 0), (0x1, 0x1001, 1),
+                         (0x2, 0x1002, 0), (0x2, 0x1003, 1)]
+
+    run_simulation(axi3sr, tb(), vcd_name="axi3sr_outstanding.vcd")
+
+
+def test_axi3_slave_reader_rom():
+    port = AXI3ReadPort(id_width=12, addr_width=21, data_width=32)
+    regfile = [0x2000 + x for x in range(32)]
+
+    axi3sr = AXI3RegReader(port, regfile)
+
+    def tb():
+        # Read two bursts, the second while the first is being returned,
+        # with a stall on RREADY partway through.
+        yield port.arlen.eq(3-1)
+        yield port.arsize.eq(BURST_SIZE_4)
+        yield port.arburst.eq(BURST_TYPE_INCR)
+        yield port.arid.eq(0x1)
+        yield port.araddr.eq(4*5)
+        yield port.arvalid.eq(1)
+        yield
+        yield port.arid.eq(0x2)
+        yield port.araddr.eq(4*30)
+        yield port.arlen.eq(2-1)
+        yield
+        yield port.arvalid.eq(0)
+        beats = []
+        for cycle in range(12):
+            yield port.rready.eq(cycle != 3)
+            if (yield port.rvalid) and (yield port.rready):
+                beats.append(((yield port.rid), (yield port.rdata),
+                              (yield port.rlast)))
+            yield
+        assert beats == [(0x1, 0x2005, 0), (0x1, 0x2006, 0),
+                         (0x1, 0x2007, 1), (0x2, 0x201E, 0),
+                         (0x2, 0x201F, 1)]
+
+    run_simulation(axi3sr, tb(), vcd_name="axi3sr_rom.vcd")
+
+
+def test_axi3_slave_reader_incr_only():
+    port = AXI3ReadPort(id_width=12, addr_width=21, data_width=32)
+    regfile = Array(Signal(32, reset=0x4000 + x) for x in range(4))
+
+    axi3sr = AXI3RegReader(port, regfile, allowed_bursts=(BURST_TYPE_INCR,))
+
+    def tb():
+        # A FIXED burst is rejected, then an INCR burst is read normally.
+        yield port.arsize.eq(BURST_SIZE_4)
+        yield port.rready.eq(1)
+        beats = []
+        for burst in (BURST_TYPE_FIXED, BURST_TYPE_INCR):
+            yield port.araddr.eq(4*1)
+            yield port.arlen.eq(2-1)
+            yield port.arburst.eq(burst)
+            yield port.arvalid.eq(1)
+            yield
+            yield port.arvalid.eq(0)
+            for _ in range(4):
+                if (yield port.rvalid):
+                    beats.append(((yield port.rresp), (yield port.rlast)))
+                    if burst == BURST_TYPE_INCR:
+                        beats[-1] += ((yield port.rdata),)
+                yield
+        assert beats == [(RESP_SLVERR, 0), (RESP_SLVERR, 1),
+                         (RESP_OKAY, 0, 0x4001), (RESP_OKAY, 1, 0x4002)]
+
+    run_simulation(axi3sr, tb(), vcd_name="axi3sr_incr_only.vcd")
+
+
+def test_axi3_slave_reader_bounds():
+    port = AXI3ReadPort(id_width=12, addr_width=21, data_width=32)
+    regfile = Array(Signal(32, reset=0x5000 + x) for x in range(5))
+
+    axi3sr = AXI3RegReader(port, regfile)
+
+    def tb():
+        # Check bursts ending inside and just past a register file whose
+        # length is not a power of two, and one far beyond it.
+        yield port.arsize.eq(BURST_SIZE_4)
+        yield port.arburst.eq(BURST_TYPE_INCR)
+        yield port.rready.eq(1)
+        responses = []
+        for idx, n in ((3, 2), (4, 2), (0x100, 1)):
+            yield port.araddr.eq(4*idx)
+            yield port.arlen.eq(n-1)
+            yield port.arvalid.eq(1)
+            yield
+            yield port.arvalid.eq(0)
+            for _ in range(4):
+                if (yield port.rvalid) and (yield port.rlast):
+                    responses.append((yield port.rresp))
+                yield
+        assert responses == [RESP_OKAY, RESP_SLVERR, RESP_SLVERR]
+
+    run_simulation(axi3sr, tb(), vcd_name="axi3sr_bounds.vcd")
+
+
+def test_axi3_slave_memory():
+    rport = AXI3ReadPort(id_width=12, addr_width=21, data_width=32)
+    wport = AXI3WritePort(id_width=12, addr_width=21, data_width=32)
+    mem = Memory(32, 8, init=[0x3000 + x for x in range(8)])
+
+    top = Module()
+    top.submodules.reader = AXI3RegReader(rport, mem)
+    top.submodules.writer = AXI3RegWriter(wport, mem)
+    top.specials += mem
+
+    def tb():
+        # Write two words at register 2
+        yield wport.awid.eq(0x5)
+        yield wport.awaddr.eq(4*2)
+        yield wport.awlen.eq(2-1)
+        yield wport.awsize.eq(BURST_SIZE_4)
+        yield wport.awburst.eq(BURST_TYPE_INCR)
+        yield wport.awvalid.eq(1)
+        yield wport.bready.eq(1)
+        yield
+        yield wport.awvalid.eq(0)
+        for data, last in ((0xAA, 0), (0xBB, 1)):
+            yield wport.wdata.eq(data)
+            yield wport.wlast.eq(last)
+            yield wport.wvalid.eq(1)
+            yield
+            while not (yield wport.wready):
+                yield
+        yield wport.wvalid.eq(0)
+        while not (yield wport.bvalid):
+            yield
+        assert (yield wport.bid) == 0x5
+        assert (yield wport.bresp) == RESP_OKAY
+        yield
+
+        # Read them back along with their neighbours
+        yield rport.arid.eq(0x6)
+        yield rport.araddr.eq(4*1)
+        yield rport.arlen.eq(4-1)
+        yield rport.arsize.eq(BURST_SIZE_4)
+        yield rport.arburst.eq(BURST_TYPE_INCR)
+        yield rport.arvalid.eq(1)
+        yield rport.rready.eq(1)
+        yield
+        yield rport.arvalid.eq(0)
+        beats = []
+        for _ in range(6):
+            if (yield rport.rvalid):
+                beats.append(((yield rport.rid), (yield rport.rdata),
+                              (yield rport.rlast)))
+            yield
+        assert beats == [(0x6, 0x3001, 0), (0x6, 0xAA, 0),
+                         (0x6, 0xBB, 0), (0x6, 0x3004, 1)]
+
+    run_simulation(top, tb(), vcd_name="axi3s_memory.vcd")
+
+
 def test_axi3_slave_writer():
     port = AXI3WritePort(id_width=12, addr_width=21, data_width=32)
 
@@ -220,10 +423,10 @@ def test_axi3_slave_writer():
         assert (yield port.awready)
         yield port.awvalid.eq(1)
         yield
-        yield
         yield port.awvalid.eq(0)
         yield
         yield
+        yield
         assert (yield port.wready)
         yield port.wid.eq(0x123)
         yield port.wdata.eq(0xDEADBEEF)
@@ -281,10 +484,10 @@ def test_axi3_slave_writer():
         assert (yield port.awready)
         yield port.awvalid.eq(1)
         yield
-        yield
         yield port.awvalid.eq(0)
         yield
         yield
+        yield
         assert (yield port.wready)
         yield port.wid.eq(0x124)
         yield port.wdata.eq(0xABAD1DEA)
@@ -319,10 +522,10 @@ def test_axi3_slave_writer():
         assert (yield port.awready)
         yield port.awvalid.eq(1)
         yield
-        yield
         yield port.awvalid.eq(0)
         yield
         yield
+        yield
         assert (yield port.wready)
         yield port.wid.eq(0x125)
         yield port.wdata.eq(0xC0FFEE00)
@@ -355,11 +558,199 @@ def test_axi3_slave_writer():
         yield port.bready.eq(0)
         yield
         yield
+        assert (yield reg1) == 0xABAD1DEA
+        assert (yield reg3) == 0xABCDEF00
 
     run_simulation(axi3sw, tb(), vcd_name="axi3sw.vcd")
 
 
-def test_axi3_to_bram():
+def test_axi3_slave_writer_outstanding():
+    port = AXI3WritePort(id_width=12, addr_width=21, data_width=32)
+    regs = [Signal(32) for _ in range(4)]
+    regfile = Array(regs)
+
+    axi3sw = AXI3RegWriter(port, regfile)
+
+    def tb():
+        # Issue two 2-beat bursts back to back, without accepting any
+        # responses.
+        yield port.awlen.eq(2-1)
+        yield port.awsize.eq(BURST_SIZE_4)
+        yield port.awburst.eq(BURST_TYPE_INCR)
+        yield port.awid.eq(0x1)
+        yield port.awaddr.eq(0x0)
+        yield port.awvalid.eq(1)
+        yield
+        yield port.awid.eq(0x2)
+        yield port.awaddr.eq(0x8)
+        yield
+        yield port.awvalid.eq(0)
+
+        # Both bursts' data is accepted without any gap between them.
+        beats = 0
+        handshakes = []
+        yield port.wdata.eq(0xA0)
+        yield port.wlast.eq(0)
+        yield port.wvalid.eq(1)
+        for cycle in range(10):
+            yield
+            if (yield port.wvalid) and (yield port.wready):
+                handshakes.append(cycle)
+                beats += 1
+                yield port.wdata.eq(0xA0 + beats)
+                yield port.wlast.eq(beats % 2 == 1)
+                yield port.wvalid.eq(beats < 4)
+        assert handshakes == list(range(handshakes[0], handshakes[0] + 4))
+
+        # Both responses are then returned in order.
+        assert (yield port.bvalid)
+        assert (yield port.bid) == 0x1
+        yield port.bready.eq(1)
+        yield
+        yield
+        assert (yield port.bvalid)
+        assert (yield port.bid) == 0x2
+        yield
+        assert not (yield port.bvalid)
+
+        reg_contents = []
+        for reg in regs:
+            reg_contents.append((yield reg))
+        assert reg_contents == [0xA0, 0xA1, 0xA2, 0xA3]
+
+    run_simulation(axi3sw, tb(), vcd_name="axi3sw_outstanding.vcd")
+
+
+def test_axi3_slave_writer_wstrb():
+    port = AXI3WritePort(id_width=12, addr_width=21, data_width=32)
+    regs = [Signal(32, reset=0x11223344) for _ in range(2)]
+    regfile = Array(regs)
+
+    axi3sw = AXI3RegWriter(port, regfile, honour_wstrb=True)
+
+    def tb():
+        # Write two beats with different byte strobes
+        yield port.awaddr.eq(0x0)
+        yield port.awlen.eq(2-1)
+        yield port.awsize.eq(BURST_SIZE_4)
+        yield port.awburst.eq(BURST_TYPE_INCR)
+        yield port.awvalid.eq(1)
+        yield port.bready.eq(1)
+        yield
+        yield port.awvalid.eq(0)
+        for strb, last in ((0b0101, 0), (0b1000, 1)):
+            yield port.wdata.eq(0xAABBCCDD)
+            yield port.wstrb.eq(strb)
+            yield port.wlast.eq(last)
+            yield port.wvalid.eq(1)
+            yield
+            while not (yield port.wready):
+                yield
+        yield port.wvalid.eq(0)
+        while not (yield port.bvalid):
+            yield
+        assert (yield port.bresp) == RESP_OKAY
+        assert (yield regs[0]) == 0x11BB33DD
+        assert (yield regs[1]) == 0xAA223344
+
+    run_simulation(axi3sw, tb(), vcd_name="axi3sw_wstrb.vcd")
+
+
+def test_axi3_slave_signals():
+    regs = [Signal(32, reset=0x1000 + x) for x in range(4)]
+    regfile = Array(regs)
+
+    arid, araddr, arlen = Signal(12), Signal(21), Signal(4)
+    arsize, arburst = Signal(3), Signal(2)
+    arvalid, rready = Signal(), Signal()
+    axi3sr = AXI3SlaveReader(arid, araddr, arlen, arsize, arburst, arvalid,
+                             rready, regfile)
+
+    awid, awaddr, awlen = Signal(12), Signal(21), Signal(4)
+    awsize, awburst, awvalid = Signal(3), Signal(2), Signal()
+    wid, wdata, wstrb = Signal(12), Signal(32), Signal(4)
+    wlast, wvalid, bready = Signal(), Signal(), Signal()
+    axi3sw = AXI3SlaveWriter(awid, awaddr, awlen, awsize, awburst, awvalid,
+                             wid, wdata, wstrb, wlast, wvalid, bready,
+                             regfile)
+
+    top = Module()
+    top.submodules += [axi3sr, axi3sw]
+
+    def tb():
+        # Write a single word to register 2.
+        yield awid.eq(0x12)
+        yield awaddr.eq(0x8)
+        yield awsize.eq(BURST_SIZE_4)
+        yield awburst.eq(BURST_TYPE_INCR)
+        yield awvalid.eq(1)
+        yield wdata.eq(0xC0FFEE)
+        yield wlast.eq(1)
+        yield wvalid.eq(1)
+        yield bready.eq(1)
+        yield
+        assert (yield axi3sw.awready)
+        yield awvalid.eq(0)
+        while not (yield axi3sw.wready):
+            yield
+        yield
+        yield wvalid.eq(0)
+        while not (yield axi3sw.bvalid):
+            yield
+        assert (yield axi3sw.bid) == 0x12
+        assert (yield axi3sw.bresp) == RESP_OKAY
+        yield
+
+        # Read it back.
+        yield arid.eq(0x34)
+        yield araddr.eq(0x8)
+        yield arsize.eq(BURST_SIZE_4)
+        yield arburst.eq(BURST_TYPE_INCR)
+        yield arvalid.eq(1)
+        yield rready.eq(1)
+        yield
+        assert (yield axi3sr.arready)
+        yield arvalid.eq(0)
+        while not (yield axi3sr.rvalid):
+            yield
+        assert (yield axi3sr.rid) == 0x34
+        assert (yield axi3sr.rdata) == 0xC0FFEE
+        assert (yield axi3sr.rresp) == RESP_OKAY
+        assert (yield axi3sr.rlast)
+
+    run_simulation(top, tb(), vcd_name="axi3slavesignals.vcd")
+
+
+def test_axi3_slave_reader_signals_64bit():
+    regs = [Signal(64, reset=0x0123456789ABCDEF + x) for x in range(4)]
+    regfile = Array(regs)
+
+    arid, araddr, arlen = Signal(12), Signal(21), Signal(4)
+    arsize, arburst = Signal(3), Signal(2)
+    arvalid, rready = Signal(), Signal()
+    axi3sr = AXI3SlaveReader(arid, araddr, arlen, arsize, arburst, arvalid,
+                             rready, regfile)
+
+    def tb():
+        # Read register 2, which must come back at its full width.
+        yield araddr.eq(0x10)
+        yield arsize.eq(BURST_SIZE_8)
+        yield arburst.eq(BURST_TYPE_INCR)
+        yield arvalid.eq(1)
+        yield rready.eq(1)
+        yield
+        assert (yield axi3sr.arready)
+        yield arvalid.eq(0)
+        while not (yield axi3sr.rvalid):
+            yield
+        assert (yield axi3sr.rdata) == 0x0123456789ABCDEF + 2
+        assert (yield axi3sr.rlast)
+
+    run_simulation(axi3sr, tb(), vcd_name="axi3slavesignals64.vcd")
+
+
+@pytest.mark.parametrize("outstanding", [1, 2, 4])
+def test_axi3_to_bram(outstanding):
     read_port = AXI3ReadPort(id_width=2, addr_width=6, data_width=32)
     regs = [Signal(32, reset=x) for x in range(16)]
     regfile = Array(regs)
@@ -371,7 +762,8 @@ def test_axi3_to_bram():
 
     trigger = Signal()
 
-    axi3tobram = AXI3ToBRAM(read_port, bram_port, trigger, 0, 16, 4)
+    axi3tobram = AXI3ToBRAM(read_port, bram_port, trigger, 0, 16, 4,
+                            outstanding=outstanding)
 
     top = Module()
     top.submodules += [axi3tobram, axi3sr]
@@ -394,6 +786,90 @@ def test_axi3_to_bram():
     run_simulation(top, tb(), vcd_name="axi3tobram.vcd")
 
 
+def test_axi3_to_bram_base():
+    read_port = AXI3ReadPort(id_width=2, addr_width=6, data_width=32)
+    regs = [Signal(32, reset=0x100 + x) for x in range(16)]
+    regfile = Array(regs)
+
+    axi3sr = AXI3RegReader(read_port, regfile)
+
+    bram = Memory(32, 32)
+    bram_port = bram.get_port(write_capable=True)
+
+    trigger = Signal()
+    bram_base = Signal(5, reset=16)
+
+    axi3tobram = AXI3ToBRAM(read_port, bram_port, trigger, 0, 16, 4,
+                            bram_base=bram_base)
+
+    top = Module()
+    top.submodules += [axi3tobram, axi3sr]
+    top.specials += [bram, bram_port]
+
+    def tb():
+        yield trigger.eq(1)
+        yield
+        yield trigger.eq(0)
+        for _ in range(100):
+            yield
+
+        bram_contents = []
+        for i in range(32):
+            bram_contents.append((yield bram[i]))
+        assert bram_contents == [0]*16 + [0x100 + x for x in range(16)]
+
+    run_simulation(top, tb(), vcd_name="axi3tobram_base.vcd")
+
+
+def test_axi3_to_bram_throughput():
+    read_port = AXI3ReadPort(id_width=2, addr_width=6, data_width=32)
+    regs = [Signal(32, reset=0x100 + x) for x in range(8)]
+    regfile = Array(regs)
+
+    axi3sr = AXI3RegReader(read_port, regfile)
+
+    bram = Memory(32, 8)
+    bram_port = bram.get_port(write_capable=True)
+
+    trigger = Signal()
+
+    axi3tobram = AXI3ToBRAM(read_port, bram_port, trigger, 0, 8, 4)
+
+    top = Module()
+    top.submodules += [axi3tobram, axi3sr]
+    top.specials += [bram, bram_port]
+
+    def tb():
+        yield trigger.eq(1)
+        yield
+        yield trigger.eq(0)
+        yield
+
+        # RREADY is never deasserted while the slave is returning data, and
+        # the second burst is requested early enough to follow the first
+        # without a gap.
+        stalls = 0
+        beats = []
+        cycle = 0
+        while not (yield axi3tobram.ready):
+            if (yield read_port.rvalid):
+                if (yield read_port.rready):
+                    beats.append(cycle)
+                else:
+                    stalls += 1
+            cycle += 1
+            yield
+        assert stalls == 0
+        assert beats == list(range(beats[0], beats[0] + 8))
+
+        bram_contents = []
+        for i in range(8):
+            bram_contents.append((yield bram[i]))
+        assert bram_contents == [0x100 + x for x in range(8)]
+
+    run_simulation(top, tb(), vcd_name="axi3tobram_throughput.vcd")
+
+
 def test_bram_to_axi3():
     write_port = AXI3WritePort(id_width=2, addr_width=6, data_width=32)
     regs = [Signal(32) for _ in range(16)]
@@ -432,7 +908,155 @@ def test_bram_to_axi3():
     run_simulation(top, tb(), vcd_name="bramtoaxi3.vcd")
 
 
-def test_axi3_read_mux():
+def test_bram_to_axi3_throughput():
+    write_port = AXI3WritePort(id_width=2, addr_width=6, data_width=32)
+    bram = Memory(32, 8, [0x100 + x for x in range(8)])
+    bram_port = bram.get_port()
+    trigger = Signal()
+
+    bramtoaxi3 = BRAMToAXI3(write_port, bram_port, trigger, 0, 8, 4)
+
+    top = Module()
+    top.submodules += bramtoaxi3
+    top.specials += [bram, bram_port]
+
+    def tb():
+        # Act as a slave which is always ready for addresses and data.
+        yield write_port.awready.eq(1)
+        yield write_port.wready.eq(1)
+        yield trigger.eq(1)
+        yield
+        yield trigger.eq(0)
+        beats = []
+        for cycle in range(20):
+            if (yield write_port.wvalid):
+                beats.append((cycle, (yield write_port.wdata),
+                              (yield write_port.wlast)))
+            yield
+        assert [b[1:] for b in beats] == [
+            (0x100 + x, int(x % 4 == 3)) for x in range(8)]
+
+        # The second burst's address is issued while the first is being
+        # written, so one beat is transferred every cycle throughout.
+        cycles = [b[0] for b in beats]
+        assert cycles == list(range(cycles[0], cycles[0] + 8))
+
+        # We only become ready again once both responses are received.
+        assert not (yield bramtoaxi3.ready)
+        yield write_port.bvalid.eq(1)
+        yield
+        yield
+        yield write_port.bvalid.eq(0)
+        assert not (yield bramtoaxi3.ready)
+        yield
+        assert (yield bramtoaxi3.ready)
+
+    run_simulation(top, tb(), vcd_name="bramtoaxi3_throughput.vcd")
+
+
+def test_bram_to_axi3_64bit():
+    write_port = AXI3WritePort(id_width=2, addr_width=8, data_width=64)
+    words = [0x0123456789ABCDEF + x for x in range(4)]
+    bram = Memory(64, 4, words)
+    bram_port = bram.get_port()
+    trigger = Signal()
+
+    bramtoaxi3 = BRAMToAXI3(write_port, bram_port, trigger, 0x40, 4, 2)
+
+    top = Module()
+    top.submodules += bramtoaxi3
+    top.specials += [bram, bram_port]
+
+    def tb():
+        # Act as a slave which is always ready for addresses and data.
+        yield write_port.awready.eq(1)
+        yield write_port.wready.eq(1)
+        yield trigger.eq(1)
+        yield
+        yield trigger.eq(0)
+        addrs = []
+        beats = []
+        for _ in range(12):
+            if (yield write_port.awvalid):
+                addrs.append(((yield write_port.awaddr),
+                              (yield write_port.awsize)))
+            if (yield write_port.wvalid):
+                beats.append(((yield write_port.wdata),
+                              (yield write_port.wstrb)))
+            yield
+
+        # Each beat is a whole 64 bit word, so bursts are 16 bytes apart.
+        assert addrs == [(0x40, BURST_SIZE_8), (0x50, BURST_SIZE_8)]
+        assert beats == [(word, 0xFF) for word in words]
+
+    run_simulation(top, tb(), vcd_name="bramtoaxi3_64bit.vcd")
+
+
+def test_bram_to_axi3_stall():
+    write_port = AXI3WritePort(id_width=2, addr_width=6, data_width=32)
+    bram = Memory(32, 8, [0x200 + x for x in range(8)])
+    bram_port = bram.get_port()
+    trigger = Signal()
+
+    bramtoaxi3 = BRAMToAXI3(write_port, bram_port, trigger, 0, 8, 4)
+
+    top = Module()
+    top.submodules += bramtoaxi3
+    top.specials += [bram, bram_port]
+
+    def tb():
+        # Act as a slave which accepts data in an irregular pattern, and
+        # check every beat still carries the right word.
+        yield write_port.awready.eq(1)
+        yield trigger.eq(1)
+        yield
+        yield trigger.eq(0)
+        pattern = [1, 0, 0, 1, 1, 0, 1, 1, 1, 0, 1, 0, 0, 0, 1, 1]
+        beats = []
+        for wready in pattern * 2:
+            yield write_port.wready.eq(wready)
+            if (yield write_port.wvalid) and (yield write_port.wready):
+                beats.append((yield write_port.wdata))
+            yield
+        assert beats == [0x200 + x for x in range(8)]
+
+    run_simulation(top, tb(), vcd_name="bramtoaxi3_stall.vcd")
+
+
+def test_axi3_copy():
+    read_port = AXI3ReadPort(id_width=2, addr_width=7, data_width=32)
+    write_port = AXI3WritePort(id_width=2, addr_width=7, data_width=32)
+    src_regs = [Signal(32, reset=0x300 + x) for x in range(16)]
+    dst_regs = [Signal(32) for _ in range(32)]
+
+    axi3sr = AXI3RegReader(read_port, Array(src_regs))
+    axi3sw = AXI3RegWriter(write_port, Array(dst_regs))
+
+    trigger = Signal()
+    copy = AXI3Copy(read_port, write_port, trigger, 4*4, 4*16, 8, 4)
+
+    top = Module()
+    top.submodules += [axi3sr, axi3sw, copy]
+
+    def tb():
+        yield trigger.eq(1)
+        yield
+        yield trigger.eq(0)
+        yield
+        while not (yield copy.ready):
+            yield
+
+        dst_contents = []
+        for reg in dst_regs:
+            dst_contents.append((yield reg))
+        expected = [0]*16 + [0x300 + x for x in range(4, 12)] + [0]*8
+        assert dst_contents == expected
+
+    run_simulation(top, tb(), vcd_name="axi3copy.vcd")
+
+
+@pytest.mark.parametrize("register_slave", [False, True])
+def test_axi3_read_mux(register_slave):
     slave_port = AXI3ReadPort(id_width=2, addr_width=6, data_width=32)
     reg0 = Signal(32, reset=0xCAFE)
     reg1 = Signal(32, reset=0xBEEF)
@@ -441,7 +1065,7 @@ def test_axi3_read_mux():
     regfile = Array([reg0, reg1, reg2, reg3])
     axi3sr = AXI3RegReader(slave_port, regfile)
 
-    mux = AXI3ReadMux(slave_port)
+    mux = AXI3ReadMux(slave_port, register_slave)
 
     bram0 = Memory(32, 2)
     bram1 = Memory(32, 2)
@@ -498,7 +1122,48 @@ def test_axi3_read_mux():
     run_simulation(top, tb(), vcd_name="axi3readmux.vcd")
 
 
-def test_axi3_write_mux():
+def test_axi3_read_mux_round_robin():
+    slave_port = AXI3ReadPort(id_width=2, addr_width=6, data_width=32)
+    regfile = Array(Signal(32, reset=x) for x in range(4))
+    axi3sr = AXI3RegReader(slave_port, regfile)
+    mux = AXI3ReadMux(slave_port)
+    masters = [mux.add_master() for _ in range(4)]
+
+    top = Module()
+    top.submodules += [axi3sr, mux]
+
+    def request(idxs):
+        # Request a single read from each master in `idxs` at once, and
+        # return the order in which their addresses are accepted.
+        for i in idxs:
+            yield masters[i].araddr.eq(4*i)
+            yield masters[i].arvalid.eq(1)
+        order = []
+        for _ in range(20):
+            yield
+            for i in idxs:
+                if (yield masters[i].arvalid) and (yield masters[i].arready):
+                    order.append(i)
+                    yield masters[i].arvalid.eq(0)
+        return order
+
+    def tb():
+        for master in masters:
+            yield master.arsize.eq(BURST_SIZE_4)
+            yield master.arburst.eq(BURST_TYPE_INCR)
+            yield master.rready.eq(1)
+        yield
+
+        # Each master waiting is served in turn after the last one served.
+        assert (yield from request([2])) == [2]
+        assert (yield from request([0, 3])) == [3, 0]
+        assert (yield from request([0, 1, 3])) == [1, 3, 0]
+
+    run_simulation(top, tb(), vcd_name="axi3readmux_rr.vcd")
+
+
+@pytest.mark.parametrize("register_slave", [False, True])
+def test_axi3_write_mux(register_slave):
     slave_port = AXI3WritePort(id_width=2, addr_width=6, data_width=32)
     reg0 = Signal(32)
     reg1 = Signal(32)
@@ -506,7 +1171,7 @@ def test_axi3_write_mux():
     reg3 = Signal(32)
     regfile = Array([reg0, reg1, reg2, reg3])
     axi3sw = AXI3RegWriter(slave_port, regfile)
-    mux = AXI3WriteMux(slave_port)
+    mux = AXI3WriteMux(slave_port, register_slave)
 
     bram0 = Memory(32, 2, [0xCAFE])
     bram1 = Memory(32, 2, [0xBEEF])
@@ -1,7 +1,7 @@
 from ..rgb_lcd import RGBLCD, LCDPatternGenerator, DoubleBuffer
 from ..axi3 import AXI3ReadPort, AXI3WritePort, AXI3RegWriter
 from migen import Signal, Module, Array
-from migen.sim import run_simulation
+from migen.sim import run_simulation, passive
 
 
 def test_lcd():
@@ -33,6 +33,18 @@ def test_double_buffer():
     vsync = Signal()
     drawn = Signal()
     db = DoubleBuffer(fb1, fb2, vsync, drawn)
+    swaps = []
+
+    @passive
+    def monitor():
+        front = (yield db.front)
+        while True:
+            yield
+            if (yield db.swapped):
+                # The new buffers must be in place when the swap is seen
+                swaps.append(((yield db.front), (yield db.back)))
+                assert (yield db.back) == front
+            front = (yield db.front)
 
     def tb():
         yield drawn.eq(0)
@@ -64,7 +76,10 @@ def test_double_buffer():
         for _ in range(30):
             yield
 
-    run_simulation(db, tb(), vcd_name="db.vcd")
+        # Only the vsync after drawing completed swaps the buffers
+        assert swaps == [(0x12345, 0xABCDE)]
+
+    run_simulation(db, [tb(), monitor()], vcd_name="db.vcd")
 
 
 def test_patgen():
@@ -4,7 +4,7 @@ User interface.
 Copyright 2018 Adam Greig
 """
 
-from migen import Module, Signal, If, FSM, NextState, Memory, Mux, Cat
+from migen import Module, Signal, If, FSM, NextState, Memory, Mux
 from .axi3 import AXI3ToFromBRAM
 import numpy as np
 
@@ -94,12 +94,16 @@ class UIOverlay(Module):
         dsopx = Signal()
         dsorow = Signal(8)
         dsocol = Signal(6)
+        dsocol_d = Signal(6)
         self.comb += [
             dsorow.eq(row - 8),
             dsocol.eq((col - 8) >> 2),
-            dsorp.adr.eq(Cat(dsocol, dsorow))
+            dsorp.adr.eq(dsorow)
+        ]
+        self.sync += [
+            dsocol_d.eq(dsocol),
+            dsopx.eq(dsorp.dat_r.part(dsocol_d, 1)),
         ]
-        self.sync += dsopx.eq(dsorp.dat_r)
 
         red = 0b000000000000000011111111
         grn = 0b000000001111111100000000